@@ -0,0 +1,598 @@
+"""Pre-aggregated statistics for the dashboard panels.
+
+Everything here is built once per dataset version and answers panel
+queries from compact summaries instead of scanning rows on every rerun.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# OLAP CUBE
+# ============================================
+
+# Cube dimensions. num_members (0-50) and clan_level are small integer
+# ranges, so each value is its own bucket and slider ranges stay exact.
+CUBE_DIMENSIONS = ['war_frequency', 'clan_war_league', 'isFamilyFriendly', 'num_members', 'clan_level']
+CUBE_MEASURES = ['win_rate', 'num_members', 'engagement_score', 'clan_points', 'total_wars']
+
+
+def partition_rows(df, dimensions):
+    """Group rows into cells over the given dimensions
+
+    Returns (values, coords, cell_of_row): the sorted distinct values of each
+    dimension, each occupied cell's code per dimension (-1 for missing, e.g.
+    no league) and the cell id of every row.
+    """
+    codes, values = [], {}
+    for dim in dimensions:
+        dim_codes, uniques = pd.factorize(df[dim], sort=True, use_na_sentinel=True)
+        codes.append(dim_codes)
+        values[dim] = np.asarray(uniques, dtype=object)
+
+    # Shift codes by one so the missing bucket fits in ravel_multi_index
+    shape = tuple(len(values[dim]) + 1 for dim in dimensions)
+    keys = np.ravel_multi_index([dim_codes + 1 for dim_codes in codes], shape)
+    cell_keys, cell_of_row = np.unique(keys, return_inverse=True)
+
+    coords = {
+        dim: dim_codes - 1
+        for dim, dim_codes in zip(dimensions, np.unravel_index(cell_keys, shape))
+    }
+    return values, coords, cell_of_row
+
+
+class CellIndex(ABC):
+    """Filter-constraint lookup over partition cells, shared by the summaries below"""
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS):
+        self.dimensions = list(dimensions)
+        self.values, self.coords, cell_of_row = partition_rows(df, self.dimensions)
+        self.n_cells = len(self.coords[self.dimensions[0]])
+        self._accumulate(df, cell_of_row)
+
+    @abstractmethod
+    def _accumulate(self, df, cell_of_row):
+        """Build the per-cell summary from each row's cell id"""
+
+    def cells(self, constraints):
+        """Boolean mask of cells matching a filter constraint dict (see filters.py)"""
+        mask = np.ones(self.n_cells, dtype=bool)
+        for dim in self.dimensions:
+            constraint = constraints.get(dim)
+            if constraint is None:
+                continue
+
+            coords = self.coords[dim]
+            if isinstance(constraint, tuple):
+                low, high = constraint
+                accepted = np.flatnonzero((self.values[dim] >= low) & (self.values[dim] <= high))
+            else:
+                accepted = np.flatnonzero(np.isin(self.values[dim], list(constraint)))
+            mask &= np.isin(coords, accepted)
+        return mask
+
+
+class Cube(CellIndex):
+    """Count, sum and sum of squares per occupied dimension cell"""
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS, measures=CUBE_MEASURES):
+        self.measures = list(measures)
+        super().__init__(df, dimensions)
+
+    def _accumulate(self, df, cell_of_row):
+        self.count = np.bincount(cell_of_row, minlength=self.n_cells).astype(np.int64)
+        self.n, self.sum, self.sumsq = {}, {}, {}
+        for measure in self.measures:
+            values = df[measure].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            values = np.where(valid, values, 0.0)
+            self.n[measure] = np.bincount(cell_of_row, weights=valid, minlength=self.n_cells)
+            self.sum[measure] = np.bincount(cell_of_row, weights=values, minlength=self.n_cells)
+            self.sumsq[measure] = np.bincount(cell_of_row, weights=values * values, minlength=self.n_cells)
+
+    def aggregate(self, constraints, by=None, known=None):
+        """Group statistics for the rows matching constraints
+
+        Returns a DataFrame with a 'count' column and, per measure, its mean
+        and sample standard deviation ('<measure>_std'). ``by`` groups on a
+        cube dimension (missing values are dropped, as in pandas groupby);
+        ``known`` restricts to cells where that dimension is not missing.
+        """
+        mask = self.cells(constraints)
+        if by is not None:
+            mask &= self.coords[by] >= 0
+        if known is not None:
+            mask &= self.coords[known] >= 0
+
+        if by is None:
+            groups = np.zeros(mask.sum(), dtype=np.int64)
+            n_groups = 1
+        else:
+            groups = self.coords[by][mask]
+            n_groups = len(self.values[by])
+
+        def total(values):
+            return np.bincount(groups, weights=values[mask], minlength=n_groups)
+
+        stats = {'count': total(self.count).astype(np.int64)}
+        for measure in self.measures:
+            n = total(self.n[measure])
+            s = total(self.sum[measure])
+            ss = total(self.sumsq[measure])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                stats[measure] = s / n
+                var = (ss - s * s / n) / (n - 1)
+            stats[f'{measure}_std'] = np.sqrt(np.clip(var, 0, None))
+
+        result = pd.DataFrame(stats)
+        if by is None:
+            return result.iloc[0]
+
+        result.insert(0, by, self.values[by])
+        return result[result['count'] > 0].reset_index(drop=True)
+
+
+# ============================================
+# CORRELATION MOMENTS
+# ============================================
+
+# Q3 predictors of war success
+CORRELATION_VARS = [
+    'clan_level', 'num_members', 'mean_member_level',
+    'mean_member_trophies', 'required_trophies',
+    'engagement_score', 'trophy_efficiency'
+]
+
+
+class CorrelationMoments(CellIndex):
+    """Count, sums and cross-product sums of the Q3 variables per cell
+
+    Merging the cells that match a filter gives the full moment matrix of
+    the selection, and from it every Pearson coefficient, without touching
+    row data. Values are shifted by their dataset mean before accumulating
+    to keep the sums well conditioned. Rows with any missing variable are
+    left out.
+    """
+
+    def __init__(self, df, variables=CORRELATION_VARS + ['win_rate'], dimensions=CUBE_DIMENSIONS):
+        self.variables = list(variables)
+        super().__init__(df, dimensions)
+
+    def _accumulate(self, df, cell_of_row):
+        k = len(self.variables)
+        columns = [df[var].to_numpy(dtype=np.float64) for var in self.variables]
+        valid = np.logical_and.reduce([~np.isnan(col) for col in columns])
+
+        self.n = np.bincount(cell_of_row, weights=valid, minlength=self.n_cells)
+        self.sums = np.zeros((self.n_cells, k))
+        self.cross = np.zeros((self.n_cells, k, k))
+
+        centered = [np.where(valid, col - np.nanmean(col), 0.0) for col in columns]
+        for i in range(k):
+            self.sums[:, i] = np.bincount(cell_of_row, weights=centered[i], minlength=self.n_cells)
+            for j in range(i, k):
+                self.cross[:, i, j] = np.bincount(cell_of_row, weights=centered[i] * centered[j], minlength=self.n_cells)
+                self.cross[:, j, i] = self.cross[:, i, j]
+
+    def matrix(self, constraints):
+        """Pearson correlation matrix of the rows matching constraints"""
+        mask = self.cells(constraints)
+        return pearson_from_moments(
+            self.n[mask].sum(),
+            self.sums[mask].sum(axis=0),
+            self.cross[mask].sum(axis=0),
+            self.variables
+        )
+
+
+def pearson_from_moments(n, sums, cross, variables):
+    """Pearson correlation matrix from a count, a sum vector and a cross-product matrix"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = cross - np.outer(sums, sums) / n
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        corr = cov / np.outer(std, std)
+    corr[~np.isfinite(corr)] = np.nan
+    return pd.DataFrame(corr, index=variables, columns=variables)
+
+
+# ============================================
+# QUANTILE SKETCH
+# ============================================
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch
+
+    Values enter level 0 with weight 1. When a level holds more than
+    ``capacity`` items it is sorted and every other item (random offset) is
+    promoted to the next level with twice the weight. Each compaction at
+    level h moves any rank by at most 2**h, which bounds the rank error of
+    a quantile to about ``n * log2(n / capacity) / capacity`` in the worst
+    case (see error_bound); the typical error is much smaller. Memory stays
+    at ``capacity`` items per level, i.e. O(capacity * log(n)).
+    """
+
+    def __init__(self, capacity=2000, seed=0):
+        self.capacity = capacity
+        self.levels = []
+        self.n = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add an array of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self._push(0, values)
+        self._compact()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        self.n += other.n
+        for level, items in enumerate(other.levels):
+            if len(items):
+                self._push(level, items)
+        self._compact()
+        return self
+
+    def _push(self, level, items):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        self.levels[level] = np.concatenate((self.levels[level], items))
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                # An odd item out stays behind so the total weight is preserved
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self._push(level + 1, promoted)
+            level += 1
+
+    def error_bound(self):
+        """Worst-case rank error as a fraction of n"""
+        if self.n <= self.capacity:
+            return 0.0
+        return np.log2(self.n / self.capacity) / self.capacity
+
+    def items(self):
+        """Retained items and their weights"""
+        if not self.levels:
+            return np.empty(0), np.empty(0)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        return items, weights
+
+    def quantile(self, q):
+        """Approximate q-quantile(s), interpolated like numpy's default"""
+        return weighted_quantile(*self.items(), q)
+
+
+def weighted_quantile(items, weights, q, presorted=False):
+    """q-quantile(s) of weighted items, interpolated like numpy's default
+
+    Pass presorted=True when items are already in ascending order.
+    """
+    if len(items) == 0:
+        return np.nan if np.isscalar(q) else np.full(len(q), np.nan)
+
+    if not presorted:
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+
+    # Midpoint ranks of each weighted item, scaled to [0, n - 1]
+    ranks = np.cumsum(weights) - weights / 2 - 0.5
+    target = np.asarray(q, dtype=np.float64) * (weights.sum() - 1)
+    return np.interp(target, ranks, items)
+
+
+# Columns with per-partition sketches (anomaly cut-offs and report percentiles)
+QUANTILE_COLUMNS = ['win_rate', 'engagement_score', 'mean_member_trophies']
+
+# Range dimensions are grouped into bands of this many values for the
+# quantile partitions, which keeps the partition count (and so the items
+# kept) independent of the number of rows
+SKETCH_BANDED_DIMENSIONS = ['num_members', 'clan_level']
+SKETCH_BAND_WIDTH = 10
+
+# Items kept per column by a partition's whole summary and by each per-value one
+SKETCH_CAPACITY = 64
+SKETCH_VALUE_CAPACITY = 8
+
+
+class QuantileSketches(CellIndex):
+    """Quantile summaries per partition, merged for a filter at query time
+
+    Partitions are the cube's dimensions with num_members and clan_level
+    grouped into bands of SKETCH_BAND_WIDTH values. Each partition is
+    summarised as a whole, per num_members value and per clan_level value.
+    A summary keeps at most SKETCH_CAPACITY values per column
+    (SKETCH_VALUE_CAPACITY for a per-value one). A summary that small keeps
+    its raw values, each tagged with its num_members and clan_level value;
+    a larger one keeps the order statistics at evenly spaced ranks, each
+    standing for n / capacity rows. So the items kept are bounded by the
+    partitions times (capacity + 2 * band width * value capacity), whatever
+    the row count.
+
+    A query merges a partition inside both slider ranges, or a raw one,
+    whole, filtering raw values by their own tags. A larger partition cut
+    by a single slider comes from its per-value summaries along that
+    slider. Only one cut by both is approximated: the summarised per-value
+    summaries along one slider are scaled by the share of their rows inside
+    the other slider's range (counted exactly), as if those rows had the
+    summary's distribution. Items are stored in value order, so a query
+    masks and reweights them and interpolates without a sort. Selections
+    made of raw partitions (the 100k-row sample) get the exact quantile.
+    """
+
+    def __init__(self, df, columns=QUANTILE_COLUMNS, band_width=SKETCH_BAND_WIDTH,
+                 capacity=SKETCH_CAPACITY, value_capacity=SKETCH_VALUE_CAPACITY):
+        self.columns = list(columns)
+        self.band_width = band_width
+        self.capacity = capacity
+        self.value_capacity = value_capacity
+
+        frame = df[CUBE_DIMENSIONS + self.columns].copy()
+        for dim in SKETCH_BANDED_DIMENSIONS:
+            frame[f'{dim}_value'] = frame[dim]
+            frame[dim] = frame[dim] // band_width
+        super().__init__(frame, CUBE_DIMENSIONS)
+
+    def _accumulate(self, frame, cell_of_row):
+        width = self.band_width
+
+        # Rows per partition, num_members value and clan_level value within its bands
+        members, levels = (
+            frame[f'{dim}_value'].to_numpy(dtype=np.int64) % width
+            for dim in SKETCH_BANDED_DIMENSIONS
+        )
+        self.band_counts = np.bincount(
+            (cell_of_row * width + members) * width + levels, minlength=self.n_cells * width ** 2
+        ).reshape(self.n_cells, width, width)
+        self.count = self.band_counts.sum(axis=(1, 2))
+        self.member_rows = self.band_counts.sum(axis=2)
+        self.level_rows = self.band_counts.sum(axis=1)
+        self.band_counts = self.band_counts.astype(np.float64)
+
+        # Summary ids: whole partitions, then (partition, member value), then (partition, level value)
+        n_summaries = self.n_cells * (1 + 2 * width)
+        summary_of_row = [
+            cell_of_row,
+            self.n_cells + cell_of_row * width + members,
+            self.n_cells * (1 + width) + cell_of_row * width + levels,
+        ]
+        self.summary_capacity = np.full(n_summaries, self.value_capacity)
+        self.summary_capacity[:self.n_cells] = self.capacity
+        self.summary_rows = np.concatenate((self.count, self.member_rows.ravel(), self.level_rows.ravel()))
+        # Summaries this small keep their raw values, each tagged with its band position
+        self.raw = self.summary_rows <= self.summary_capacity
+        position_of_row = (cell_of_row * width + members) * width + levels
+
+        self.items, self.weights, self.item_summary, self.item_position = {}, {}, {}, {}
+        for col in self.columns:
+            values = frame[col].to_numpy(dtype=np.float64)
+            by_value = np.argsort(values, kind='stable')
+            by_value = by_value[~np.isnan(values[by_value])]
+
+            items, item_summary, item_position, n = [], [], [], np.zeros(n_summaries, dtype=np.int64)
+            for summary in summary_of_row:
+                # Rows grouped by summary, in value order within each
+                order = by_value[np.argsort(summary[by_value], kind='stable')]
+                rows = np.bincount(summary[order], minlength=n_summaries)
+                kept = np.minimum(rows, self.summary_capacity)
+                # Order statistics at the midpoints of `kept` equal rank blocks (every row when raw)
+                owner = np.repeat(np.arange(n_summaries), kept)
+                block = np.arange(len(owner)) - np.repeat(np.cumsum(kept) - kept, kept)
+                offsets = ((block + 0.5) * rows[owner] / kept[owner]).astype(np.int64)
+                picked = order[(np.cumsum(rows) - rows)[owner] + offsets]
+                items.append(values[picked])
+                item_summary.append(owner)
+                item_position.append(np.where(self.raw[owner], position_of_row[picked], -1))
+                n += rows
+            items, item_summary, item_position = (
+                np.concatenate(items), np.concatenate(item_summary), np.concatenate(item_position)
+            )
+
+            # Stored in value order: any selection stays sorted, so a query needs no sort
+            order = np.argsort(items, kind='stable')
+            self.items[col] = items[order]
+            self.item_summary[col] = item_summary[order].astype(np.int32)
+            self.item_position[col] = item_position[order].astype(np.int32)
+            # Rows each item stands for, per summary
+            self.weights[col] = n / np.maximum(np.minimum(n, self.summary_capacity), 1)
+
+    def _band_masks(self, dim, bounds):
+        # Per partition, which of its band's values lie inside the slider range
+        coords = self.coords[dim]
+        band = np.where(coords >= 0, self.values[dim][np.maximum(coords, 0)], np.nan).astype(np.float64)
+        values = band[:, None] * self.band_width + np.arange(self.band_width)
+        if bounds is None:
+            return np.isfinite(values)
+        low, high = bounds
+        return (values >= low) & (values <= high)
+
+    def _merge(self, constraints):
+        """Which summaries a query merges and how
+
+        Returns (scale, rows, estimated, members, levels): per summary id,
+        the weight factor of its items (0 when not merged), its rows inside
+        the filter and whether that scaling is an estimate; then the band
+        masks of each slider, per partition.
+        """
+        width = self.band_width
+        scale = np.zeros(len(self.summary_rows))
+        rows = np.zeros(len(scale))
+        estimated = np.zeros(len(scale), dtype=bool)
+        members, levels = (self._band_masks(dim, constraints.get(dim)) for dim in SKETCH_BANDED_DIMENSIONS)
+        cells = np.flatnonzero(self.cells({
+            dim: value for dim, value in constraints.items()
+            if dim not in SKETCH_BANDED_DIMENSIONS
+        }))
+        member_mask, level_mask = members[cells].astype(np.float64), levels[cells].astype(np.float64)
+        member_rows, level_rows = self.member_rows[cells], self.level_rows[cells]
+
+        # Rows of each per-value summary inside the other slider's range
+        counts = self.band_counts[cells]
+        member_inside = (counts @ level_mask[:, :, None])[:, :, 0] * member_mask
+        level_inside = (member_mask[:, None, :] @ counts)[:, 0, :] * level_mask
+        member_share = member_inside / np.maximum(member_rows, 1)
+        level_share = level_inside / np.maximum(level_rows, 1)
+
+        # Raw summaries are filtered item by item, so only summarised ones are scaled
+        n_member_ids = self.n_cells * width
+        member_ids = self.n_cells + cells[:, None] * width + np.arange(width)
+        level_ids = member_ids + n_member_ids
+        member_raw, level_raw = self.raw[member_ids], self.raw[level_ids]
+        member_scale = np.where(member_raw, member_inside > 0, member_share)
+        level_scale = np.where(level_raw, level_inside > 0, level_share)
+        member_estimated = ~member_raw & (member_share > 0) & (member_share < 1)
+        level_estimated = ~level_raw & (level_share > 0) & (level_share < 1)
+
+        # Whole when neither slider cuts the partition or it is raw, else the
+        # side estimating fewer rows
+        count = self.count[cells]
+        inside = member_inside.sum(axis=1)
+        whole = (inside == count) | self.raw[cells]
+        by_member = (member_inside * member_estimated).sum(axis=1) <= (level_inside * level_estimated).sum(axis=1)
+        use_members, use_levels = (~whole & by_member)[:, None], (~whole & ~by_member)[:, None]
+
+        scale[cells] = whole & (inside > 0)
+        rows[cells] = inside * whole
+        scale[member_ids], rows[member_ids] = member_scale * use_members, member_inside * use_members
+        scale[level_ids], rows[level_ids] = level_scale * use_levels, level_inside * use_levels
+        estimated[member_ids] = member_estimated & use_members
+        estimated[level_ids] = level_estimated & use_levels
+        return scale, rows, estimated, members, levels
+
+    def quantile(self, constraints, column, q):
+        """Approximate q-quantile(s) of column over the rows matching constraints"""
+        scale, _, _, members, levels = self._merge(constraints)
+        keep = np.flatnonzero(np.take(scale > 0, self.item_summary[column]))
+        # Raw items count only when their own band values are inside both ranges
+        position = self.item_position[column][keep]
+        width = self.band_width
+        in_range = members.ravel()[position // width] & levels.ravel()[position // width ** 2 * width + position % width]
+        keep = keep[(position < 0) | in_range]
+        weights = np.take(self.weights[column] * scale, self.item_summary[column][keep])
+        return weighted_quantile(self.items[column][keep], weights, q, presorted=True)
+
+    def error_bound(self, constraints):
+        """Worst-case rank error of quantile() as a fraction of the selected rows
+
+        This is a loose bound: it assumes every summary's error and every
+        estimated row push the quantile the same way. The measured error is
+        typically two orders of magnitude lower.
+        """
+        _, rows, estimated, _, _ = self._merge(constraints)
+        if rows.sum() == 0:
+            return 0.0
+        summary_error = np.where(self.raw, 0.0, rows / (2 * self.summary_capacity))
+        return min(float((summary_error.sum() + rows[estimated].sum()) / rows.sum()), 1.0)
+
+# ============================================
+# BOX PLOT STATISTICS
+# ============================================
+
+# Outlier points sent per box; more are thinned evenly across their range
+MAX_BOX_OUTLIERS = 200
+
+
+def box_stats(values, max_outliers=MAX_BOX_OUTLIERS):
+    """Box plot summary of ascending values, computed the way plotly.js does
+
+    Median and quartiles use plotly's default 'linear' method (interpolating
+    at position p * n - 0.5). Whiskers end at the most extreme values within
+    1.5 IQR of the box. Outliers beyond them are thinned evenly, keeping
+    both extremes, to at most max_outliers.
+    """
+    n = len(values)
+
+    def interp(p):
+        pos = min(max(p * n - 0.5, 0), n - 1)
+        low, high = int(np.floor(pos)), int(np.ceil(pos))
+        frac = pos - low
+        return frac * values[high] + (1 - frac) * values[low]
+
+    q1, median, q3 = interp(0.25), interp(0.5), interp(0.75)
+    low_fence = min(q1, values[min(np.searchsorted(values, 2.5 * q1 - 1.5 * q3, side='left'), n - 1)])
+    high_fence = max(q3, values[max(np.searchsorted(values, 2.5 * q3 - 1.5 * q1, side='right') - 1, 0)])
+
+    outliers = np.concatenate((
+        values[:np.searchsorted(values, low_fence, side='left')],
+        values[np.searchsorted(values, high_fence, side='right'):]
+    ))
+    if len(outliers) > max_outliers:
+        keep = np.unique(np.linspace(0, len(outliers) - 1, max_outliers).round().astype(np.int64))
+        outliers = outliers[keep]
+
+    return {
+        'n': n,
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(low_fence),
+        'upperfence': float(high_fence),
+        'outliers': outliers,
+    }
+
+
+# ============================================
+# OLS TRENDLINES
+# ============================================
+
+def ols_fits(df, x, y, by=None):
+    """Least-squares fit of y on x per group from running sums
+
+    One vectorized pass accumulates n, sum(x), sum(y), sum(xy), sum(x^2)
+    and sum(y^2) per group; slope, intercept and R^2 follow in closed form.
+    Rows with a missing x or y are ignored, as in statsmodels' OLS.
+    Returns a DataFrame indexed by group (a single None row when by is None)
+    with n, slope, intercept, r2, x_min and x_max.
+    """
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+
+    if by is None:
+        codes, groups = np.zeros(len(df), dtype=np.int64), [None]
+    else:
+        codes, groups = pd.factorize(df[by], sort=True, use_na_sentinel=True)
+        valid &= codes >= 0
+
+    codes, xs, ys = codes[valid], xs[valid], ys[valid]
+    n_groups = len(groups)
+
+    def total(weights=None):
+        return np.bincount(codes, weights=weights, minlength=n_groups)
+
+    n = total()
+    sx, sy = total(xs), total(ys)
+    sxy, sxx, syy = total(xs * ys), total(xs * xs), total(ys * ys)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov_xy = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        slope = cov_xy / var_x
+        intercept = (sy - slope * sx) / n
+        r2 = np.where(var_y > 0, cov_xy * cov_xy / (var_x * var_y), 0.0)
+
+    ranges = pd.Series(xs).groupby(codes).agg(['min', 'max']).reindex(range(n_groups))
+    return pd.DataFrame({
+        'n': n.astype(np.int64),
+        'slope': slope,
+        'intercept': intercept,
+        'r2': r2,
+        'x_min': ranges['min'].to_numpy(),
+        'x_max': ranges['max'].to_numpy(),
+    }, index=pd.Index(groups, name=by))
@@ -1,9 +1,20 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from aggregates import CorrelationMoments, Cube, QuantileSketches
+from data_store import has_column_store, load_dataset, open_column_store
+from derived import DerivedColumns
+from diagnostics import PerfRecorder
+from filters import FilterEngine, filter_constraints, selected, state_key
+from neighbors import SIMILARITY_FEATURES, SimilarClans
+from precompute import manifest_mtime, open_precomputed
+from report import load_snapshot
+from result_cache import ResultCache
+from search import ClanSearchIndex
+from sections import ANOMALY_ROW_OPTIONS, SECTION_WORKERS, compute_anomalies, compute_q1, compute_q2, compute_q3, ranking_index
 
 # ============================================
 # PAGE CONFIG
@@ -370,49 +381,112 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ============================================
-# HELPER FUNCTION FOR CONSISTENT CHART STYLING
-# ============================================
-
-def apply_dark_theme(fig, title=""):
-    """Apply consistent dark theme to all Plotly charts"""
-    fig.update_layout(
-        template="plotly_dark",
-        paper_bgcolor='#0E1117',
-        plot_bgcolor='#1a1f2e',
-        font=dict(family="Arial, sans-serif", color="#FFFFFF", size=14),
-        title=dict(
-            text=f"<b>{title}</b>",
-            font=dict(size=20, color="#FFFFFF", family="Arial Black")
-        ),
-        xaxis=dict(
-            title_font=dict(size=16, color="#FFFFFF"),
-            tickfont=dict(size=14, color="#FFFFFF"),
-            gridcolor='rgba(255,255,255,0.15)'
-        ),
-        yaxis=dict(
-            title_font=dict(size=16, color="#FFFFFF"),
-            tickfont=dict(size=14, color="#FFFFFF"),
-            gridcolor='rgba(255,255,255,0.15)'
-        ),
-        legend=dict(
-            font=dict(size=14, color="#FFFFFF"),
-            bgcolor='rgba(26,31,46,0.9)'
-        ),
-        margin=dict(t=70, b=70, l=70, r=40)
-    )
-    return fig
-
 # ============================================
 # LOAD DATA
 # ============================================
 
-@st.cache_data
+@st.cache_resource
 def load_data():
-    df = pd.read_csv('clash_clans_cleaned_sampled.csv')
-    return df
+    # Reads the Feather cache built by `python data_store.py build`, falling back to the CSV.
+    # One read-only frame per process, handed to every session without pickling a copy
+    return load_dataset()
+
+@st.cache_resource
+def load_column_store():
+    # Memory-mapped full dataset: shared read-only instead of pickled per rerun
+    return open_column_store()
+
+@st.cache_resource
+def get_derived_columns(dataset_version, _df):
+    # Derived metrics (expected_wr, wr_diff, ...) computed on first use, read-only
+    return DerivedColumns(_df)
+
+@st.cache_resource
+def get_filter_engine(dataset_version, _df):
+    # Built once per dataset version and shared by every session
+    return FilterEngine(_df)
+
+@st.cache_resource
+def get_cube(dataset_version, _df):
+    # Pre-aggregated cells for the Q1/Q2 group-by panels
+    return Cube(_df)
+
+@st.cache_resource
+def get_correlation_moments(dataset_version, _df):
+    # Per-cell moment matrices for the Q3 correlations
+    return CorrelationMoments(_df)
+
+@st.cache_resource
+def get_quantile_sketches(dataset_version, _df):
+    # Per-partition quantile sketches for the anomaly cut-offs
+    return QuantileSketches(_df)
+
+@st.cache_resource
+def get_ranking_index(dataset_version, _df):
+    # Row orders presorted for box statistics and the anomaly panels' top-k queries
+    return ranking_index(_df, get_derived_columns(dataset_version, _df))
 
-df = load_data()
+@st.cache_resource(show_spinner="Building the clan search index...")
+def get_search_index(dataset_version, _df):
+    # Name prefix/trigram and tag hash indexes, built on the first search
+    return ClanSearchIndex(_df)
+
+@st.cache_resource(show_spinner="Building the similar-clan index...")
+def get_similar_clans(dataset_version, _df):
+    # KD-tree over the standardized similarity features, built on the first lookup
+    return SimilarClans(_df)
+
+@st.cache_resource
+def get_report_snapshot(dataset_version, _df):
+    # Dataset-wide numbers (header metrics, slider domains, Key Findings page)
+    return load_snapshot(_df, derived=get_derived_columns(dataset_version, _df))
+
+@st.cache_resource
+def get_precomputed_results(dataset_version, artifact_mtime):
+    # Written by `python precompute.py` for every categorical filter state; None when absent or stale.
+    # Keyed on the manifest's mtime, so an artifact built while the app runs is picked up
+    return open_precomputed(dataset_version)
+
+@st.cache_resource
+def get_result_cache():
+    # Section results per filter state, shared by every session (LRU, bounded by CLAN_RESULT_CACHE_MB)
+    return ResultCache()
+
+@st.cache_resource
+def get_section_pool():
+    # Threads computing independent sections concurrently, shared by every session
+    return ThreadPoolExecutor(max_workers=SECTION_WORKERS, thread_name_prefix='section')
+
+def submit_section(name, constraints, compute, timer=None):
+    # Start looking up a section's results for the current dataset version and filter state
+    # on the section pool, trying the precompute artifact before computing them.
+    # Streamlit getters are resolved here on the script thread; .result() waits for the section
+    key = (name, df.attrs['version'], state_key(constraints))
+    cache = get_result_cache()
+    precomputed = get_precomputed_results(df.attrs['version'], manifest_mtime())
+    
+    def lookup():
+        results = precomputed.get(name, constraints) if precomputed is not None else None
+        return compute() if results is None else results
+    
+    def task():
+        return cache.get_or_compute(key, lookup)
+    
+    return get_section_pool().submit(timer(task) if timer else task)
+
+df = None
+if has_column_store():
+    try:
+        df = load_column_store()
+    except ValueError:
+        # Built by an older version of data_store.py (or incomplete): serve the smaller dataset
+        st.warning(
+            "⚠️ The column store could not be opened; it was likely built by an older version. "
+            "Showing the Feather/CSV dataset instead. Rebuild it with `python data_store.py build-store`."
+        )
+if df is None:
+    df = load_data()
+snapshot = get_report_snapshot(df.attrs['version'], df)
 
 # ============================================
 # PAGE NAVIGATION
@@ -437,20 +511,21 @@ if page == "📊 Interactive Dashboard":
     # ============================================
     
     st.title("⚔️ Clash of Clans Clan Analytics Dashboard")
-    st.markdown('<p class="subtitle">Analyzing clan performance, retention, and war success factors across 100,000+ clans</p>', unsafe_allow_html=True)
+    st.markdown(f'<p class="subtitle">Analyzing clan performance, retention, and war success factors across {snapshot["metrics"]["total_clans"]:,} clans</p>', unsafe_allow_html=True)
     
-    # Display key metrics at the top
+    # Display key metrics at the top (from the report snapshot)
+    metrics = snapshot['metrics']
     col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
-        st.metric("Total Clans", f"{len(df):,}")
+        st.metric("Total Clans", f"{metrics['total_clans']:,}")
     with col2:
-        st.metric("Avg Win Rate", f"{df['win_rate'].mean():.1f}%")
+        st.metric("Avg Win Rate", f"{metrics['avg_win_rate']:.1f}%")
     with col3:
-        st.metric("Total Members", f"{df['num_members'].sum():,}")
+        st.metric("Total Members", f"{metrics['total_members']:,}")
     with col4:
-        st.metric("Family-Friendly", f"{(df['isFamilyFriendly'].sum()/len(df)*100):.1f}%")
+        st.metric("Family-Friendly", f"{metrics['family_friendly_pct']:.1f}%")
     with col5:
-        st.metric("Avg Wars/Clan", f"{df['total_wars'].mean():.0f}")
+        st.metric("Avg Wars/Clan", f"{metrics['avg_wars_per_clan']:.0f}")
     
     st.markdown("---")
     
@@ -464,7 +539,7 @@ if page == "📊 Interactive Dashboard":
     st.sidebar.subheader("Category Filters")
     
     # War frequency filter
-    war_freq_options = ['All'] + sorted(df['war_frequency'].unique().tolist())
+    war_freq_options = ['All'] + snapshot['options']['war_frequency']
     selected_war_freq = st.sidebar.multiselect(
         "War Frequency",
         options=war_freq_options,
@@ -472,7 +547,7 @@ if page == "📊 Interactive Dashboard":
     )
     
     # Clan war league filter
-    league_options = ['All'] + sorted(df['clan_war_league'].dropna().unique().tolist())
+    league_options = ['All'] + snapshot['options']['clan_war_league']
     selected_leagues = st.sidebar.multiselect(
         "Clan War League",
         options=league_options,
@@ -489,132 +564,122 @@ if page == "📊 Interactive Dashboard":
     st.sidebar.subheader("Numeric Range Filters")
     
     # Number of members slider
+    members_domain = snapshot['domains']['num_members']
     min_members, max_members = st.sidebar.slider(
         "Number of Members",
-        min_value=int(df['num_members'].min()),
-        max_value=int(df['num_members'].max()),
-        value=(int(df['num_members'].min()), int(df['num_members'].max()))
+        min_value=members_domain[0],
+        max_value=members_domain[1],
+        value=tuple(members_domain)
     )
     
     # Clan level slider
+    level_domain = snapshot['domains']['clan_level']
     min_level, max_level = st.sidebar.slider(
         "Clan Level",
-        min_value=int(df['clan_level'].min()),
-        max_value=int(df['clan_level'].max()),
-        value=(int(df['clan_level'].min()), int(df['clan_level'].max()))
+        min_value=level_domain[0],
+        max_value=level_domain[1],
+        value=tuple(level_domain)
     )
     
-    # Apply filters
-    df_filtered = df.copy()
-    
-    if 'All' not in selected_war_freq:
-        df_filtered = df_filtered[df_filtered['war_frequency'].isin(selected_war_freq)]
-    
-    if 'All' not in selected_leagues:
-        df_filtered = df_filtered[df_filtered['clan_war_league'].isin(selected_leagues)]
+    # Opt-in timing and payload panel, drawn at the end of the page
+    perf = PerfRecorder(enabled=st.sidebar.checkbox("Performance diagnostics", value=False))
+    
+    # Apply filters (bitmap/sorted-index lookup, no full copy of df)
+    perf.begin("Filtering", rows=len(df))
+    constraints = filter_constraints(
+        selected_war_freq,
+        selected_leagues,
+        family_filter,
+        (min_members, max_members),
+        (min_level, max_level)
+    )
+    filter_engine = get_filter_engine(df.attrs['version'], df)
+    # Narrowing this session's last selection only clears the rows it removes
+    last_selection = st.session_state.get('last_selection')
+    previous = last_selection[1:] if last_selection and last_selection[0] == df.attrs['version'] else None
+    selection = filter_engine.refine(previous, constraints)
+    st.session_state['last_selection'] = (df.attrs['version'], constraints, selection)
+    df_filtered = filter_engine.view(df, selection)
+    cube = get_cube(df.attrs['version'], df)
+    moments = get_correlation_moments(df.attrs['version'], df)
+    index = get_ranking_index(df.attrs['version'], df)
+    sketches = get_quantile_sketches(df.attrs['version'], df)
+    
+    # The sections only depend on the filter state, so they are computed concurrently
+    # (or reused when any session has seen this state) and rendered in page order below
+    n_filtered = len(df_filtered)
+    anomaly_rows = st.session_state.get('anomaly_rows', ANOMALY_ROW_OPTIONS[0])
+    q1_future = submit_section(
+        'q1', constraints,
+        lambda: compute_q1(cube, constraints),
+        perf.timer("Q1 group-bys", n_filtered)
+    )
+    q2_future = submit_section(
+        'q2', constraints,
+        lambda: compute_q2(df_filtered, cube, constraints, filter_engine, index, selection),
+        perf.timer("Q2 scatter & box plots", n_filtered)
+    )
+    q3_future = submit_section(
+        'q3', constraints,
+        lambda: compute_q3(df_filtered, moments, constraints),
+        perf.timer("Q3 correlations & trendlines", n_filtered)
+    )
     
-    if family_filter == 'Family-Friendly Only':
-        df_filtered = df_filtered[df_filtered['isFamilyFriendly'] == True]
-    elif family_filter == 'Non-Family-Friendly Only':
-        df_filtered = df_filtered[df_filtered['isFamilyFriendly'] == False]
+    def submit_anomalies(constraints, selection, rows):
+        # Top-k walks over presorted row orders, limited to the filter selection
+        return submit_section(
+            ('anomalies', rows), constraints,
+            lambda: compute_anomalies(df, index, selection, sketches, constraints, rows),
+            perf.timer("Anomaly tables", n_filtered)
+        )
     
-    df_filtered = df_filtered[
-        (df_filtered['num_members'] >= min_members) & 
-        (df_filtered['num_members'] <= max_members) &
-        (df_filtered['clan_level'] >= min_level) & 
-        (df_filtered['clan_level'] <= max_level)
-    ]
+    anomalies_future = submit_anomalies(constraints, selection, anomaly_rows)
+    perf.begin("Rendering (incl. waiting)", rows=n_filtered)
     
     st.sidebar.markdown("---")
-    st.sidebar.info(f"**Filtered Clans:** {len(df_filtered):,} / {len(df):,}")
+    st.sidebar.info(f"**Filtered Clans:** {len(df_filtered):,} / {snapshot['metrics']['total_clans']:,}")
+    
+    with st.sidebar.expander("Result cache"):
+        cache_stats = get_result_cache().stats()
+        st.caption(
+            f"{cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['evictions']:,} evictions"
+        )
+        st.caption(
+            f"{cache_stats['entries']:,} entries, {cache_stats['bytes'] / 2**20:.1f} of "
+            f"{cache_stats['max_bytes'] / 2**20:.0f} MB"
+        )
     
     # ============================================
     # Q1: FAMILY-FRIENDLY ANALYSIS
     # ============================================
     
     st.header("Q1: Family-Friendly Clans - Retention & Performance")
+    q1 = q1_future.result()
+    perf.record("Q1 group-bys", q1, skip=('family_stats',))
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # Bar chart: Win rate comparison
-        family_stats = df_filtered.groupby('isFamilyFriendly').agg({
-            'win_rate': 'mean',
-            'num_members': 'mean',
-            'engagement_score': 'mean',
-            'clan_points': 'mean'
-        }).reset_index()
-        
-        family_stats['Family Type'] = family_stats['isFamilyFriendly'].map({
-            True: 'Family-Friendly',
-            False: 'Non-Family-Friendly'
-        })
-        
-        fig1 = px.bar(
-            family_stats,
-            x='Family Type',
-            y='win_rate',
-            title='Average Win Rate by Clan Type',
-            labels={'win_rate': 'Win Rate (%)', 'Family Type': 'Clan Type'},
-            color='Family Type',
-            color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
-            text='win_rate'
-        )
-        fig1.update_traces(texttemplate='%{text:.1f}%', textposition='outside', textfont=dict(color='#FFFFFF'))
-        fig1 = apply_dark_theme(fig1, 'Average Win Rate by Clan Type')
-        fig1.update_layout(showlegend=False)
+        # Bar chart: Win rate comparison (summed from cube cells)
+        family_stats = q1['family_stats']
+        fig1 = q1['fig1']
         st.plotly_chart(fig1, config={'displayModeBar': False}, width='stretch')
     
     with col2:
         # Bar chart: Member retention comparison
-        fig2 = px.bar(
-            family_stats,
-            x='Family Type',
-            y='num_members',
-            title='Average Member Count by Clan Type',
-            labels={'num_members': 'Average Members', 'Family Type': 'Clan Type'},
-            color='Family Type',
-            color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
-            text='num_members'
-        )
-        fig2.update_traces(texttemplate='%{text:.0f}', textposition='outside', textfont=dict(color='#FFFFFF'))
-        fig2 = apply_dark_theme(fig2, 'Average Member Count by Clan Type')
-        fig2.update_layout(showlegend=False)
+        fig2 = q1['fig2']
         st.plotly_chart(fig2, config={'displayModeBar': False}, width='stretch')
     
     # Engagement comparison
     col3, col4 = st.columns(2)
     
     with col3:
-        fig3 = px.bar(
-            family_stats,
-            x='Family Type',
-            y='engagement_score',
-            title='Engagement Score by Clan Type',
-            labels={'engagement_score': 'Wars per Member', 'Family Type': 'Clan Type'},
-            color='Family Type',
-            color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
-            text='engagement_score'
-        )
-        fig3.update_traces(texttemplate='%{text:.2f}', textposition='outside', textfont=dict(color='#FFFFFF'))
-        fig3 = apply_dark_theme(fig3, 'Engagement Score by Clan Type')
-        fig3.update_layout(showlegend=False)
+        fig3 = q1['fig3']
         st.plotly_chart(fig3, config={'displayModeBar': False}, width='stretch')
     
     with col4:
-        fig4 = px.bar(
-            family_stats,
-            x='Family Type',
-            y='clan_points',
-            title='Average Clan Points by Type',
-            labels={'clan_points': 'Clan Points', 'Family Type': 'Clan Type'},
-            color='Family Type',
-            color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
-            text='clan_points'
-        )
-        fig4.update_traces(texttemplate='%{text:.0f}', textposition='outside', textfont=dict(color='#FFFFFF'))
-        fig4 = apply_dark_theme(fig4, 'Average Clan Points by Type')
-        fig4.update_layout(showlegend=False)
+        fig4 = q1['fig4']
         st.plotly_chart(fig4, config={'displayModeBar': False}, width='stretch')
     
     # Insight box for Q1
@@ -644,40 +709,20 @@ if page == "📊 Interactive Dashboard":
     # ============================================
     
     st.header("Q2: War Frequency, Win Rate & League Relationship")
+    q2 = q2_future.result()
+    perf.record("Q2 scatter & box plots", q2)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Scatter plot: War frequency vs win rate colored by league
-        fig5 = px.scatter(
-            df_filtered,
-            x='total_wars',
-            y='win_rate',
-            color='clan_war_league',
-            size='num_members',
-            hover_data=['clan_name', 'war_frequency', 'num_members'],
-            title='War Activity vs Win Rate',
-            labels={
-                'total_wars': 'Total Wars Participated',
-                'win_rate': 'Win Rate (%)',
-                'clan_war_league': 'War League'
-            },
-            opacity=0.6,
-            color_continuous_scale='Plasma'
-        )
-        fig5 = apply_dark_theme(fig5, 'War Activity vs Win Rate (sized by members, colored by league)')
-        fig5.update_layout(height=500)
+        fig5 = q2['fig5']
         st.plotly_chart(fig5, config={'displayModeBar': False}, width='stretch')
+        st.caption(q2['fig5_caption'])
     
     with col2:
-        # Summary stats by war frequency
-        war_freq_stats = df_filtered.groupby('war_frequency').agg({
-            'win_rate': 'mean',
-            'total_wars': 'mean',
-            'clan_war_league': 'count'
-        }).reset_index()
-        war_freq_stats.columns = ['War Frequency', 'Avg Win Rate (%)', 'Avg Total Wars', 'Clan Count']
-        war_freq_stats = war_freq_stats.sort_values('Avg Win Rate (%)', ascending=False)
+        # Summary stats by war frequency (clan count only counts clans with a league)
+        war_freq_stats = q2['war_freq_stats']
         
         st.markdown("**Win Rate by War Frequency**")
         st.dataframe(
@@ -695,35 +740,12 @@ if page == "📊 Interactive Dashboard":
     
     with col3:
         # Box plot: Win rate distribution by war frequency
-        fig6 = px.box(
-            df_filtered,
-            x='war_frequency',
-            y='win_rate',
-            title='Win Rate Distribution by War Frequency',
-            labels={'war_frequency': 'War Frequency', 'win_rate': 'Win Rate (%)'},
-            color='war_frequency',
-            color_discrete_sequence=['#FFD700', '#FF6B35', '#4A90E2', '#2ECC71', '#E74C3C', '#9B59B6']
-        )
-        fig6 = apply_dark_theme(fig6, 'Win Rate Distribution by War Frequency')
-        fig6.update_layout(showlegend=False)
+        fig6 = q2['fig6']
         st.plotly_chart(fig6, config={'displayModeBar': False}, width='stretch')
     
     with col4:
         # Bar chart: Average win rate by league
-        league_stats = df_filtered.groupby('clan_war_league')['win_rate'].mean().reset_index()
-        league_stats = league_stats.sort_values('win_rate', ascending=False)
-        
-        fig7 = px.bar(
-            league_stats,
-            x='clan_war_league',
-            y='win_rate',
-            title='Average Win Rate by War League',
-            labels={'clan_war_league': 'War League', 'win_rate': 'Win Rate (%)'},
-            color='win_rate',
-            color_continuous_scale='RdYlGn'
-        )
-        fig7 = apply_dark_theme(fig7, 'Average Win Rate by War League')
-        fig7.update_layout(xaxis_tickangle=-45)
+        fig7 = q2['fig7']
         st.plotly_chart(fig7, config={'displayModeBar': False}, width='stretch')
     
     # Insight box for Q2
@@ -748,45 +770,16 @@ if page == "📊 Interactive Dashboard":
     # ============================================
     
     st.header("Q3: Factors Predicting War Success")
+    q3 = q3_future.result()
+    perf.record("Q3 correlations & trendlines", q3)
     
     # Correlation heatmap
     col1, col2 = st.columns([3, 2])
     
     with col1:
-        # Calculate correlations with win_rate
-        correlation_vars = [
-            'clan_level', 'num_members', 'mean_member_level', 
-            'mean_member_trophies', 'required_trophies', 
-            'engagement_score', 'trophy_efficiency'
-        ]
-        
-        correlations = df_filtered[correlation_vars + ['win_rate']].corr()['win_rate'].drop('win_rate').sort_values(ascending=False)
-        
-        fig8 = go.Figure(go.Bar(
-            x=correlations.values,
-            y=correlations.index,
-            orientation='h',
-            marker=dict(
-                color=correlations.values,
-                colorscale='RdYlGn',
-                showscale=True,
-                colorbar=dict(
-                    title=dict(text="Correlation", font=dict(color='#FFFFFF')),
-                    tickfont=dict(color='#FFFFFF')
-                )
-            ),
-            text=correlations.values,
-            texttemplate='%{text:.3f}',
-            textposition='outside',
-            textfont=dict(color='#FFFFFF')
-        ))
-        
-        fig8 = apply_dark_theme(fig8, 'Correlation with Win Rate')
-        fig8.update_layout(
-            xaxis_title='<b>Correlation Coefficient</b>',
-            yaxis_title='<b>Factors</b>',
-            height=400
-        )
+        # Calculate correlations with win_rate (merged from per-cell moments)
+        correlations = q3['correlations']
+        fig8 = q3['fig8']
         st.plotly_chart(fig8, config={'displayModeBar': False}, width='stretch')
     
     with col2:
@@ -803,43 +796,16 @@ if page == "📊 Interactive Dashboard":
     
     with col3:
         # Scatter: Mean member trophies vs win rate
-        fig9 = px.scatter(
-            df_filtered,
-            x='mean_member_trophies',
-            y='win_rate',
-            color='war_frequency',
-            size='num_members',
-            title='Member Trophy Level vs Win Rate',
-            labels={
-                'mean_member_trophies': 'Average Member Trophies',
-                'win_rate': 'Win Rate (%)'
-            },
-            opacity=0.6,
-            trendline='ols',
-            color_discrete_sequence=['#FFD700', '#FF6B35', '#4A90E2', '#2ECC71', '#E74C3C']
-        )
-        fig9 = apply_dark_theme(fig9, 'Member Trophy Level vs Win Rate')
+        # (points may be downsampled; trendlines are always fitted on every filtered clan)
+        fig9 = q3['fig9']
         st.plotly_chart(fig9, config={'displayModeBar': False}, width='stretch')
+        st.caption(q3['fig9_caption'])
     
     with col4:
         # Scatter: Engagement score vs win rate
-        fig10 = px.scatter(
-            df_filtered,
-            x='engagement_score',
-            y='win_rate',
-            color='clan_level',
-            size='num_members',
-            title='Engagement Score vs Win Rate',
-            labels={
-                'engagement_score': 'Wars per Member',
-                'win_rate': 'Win Rate (%)'
-            },
-            opacity=0.6,
-            trendline='ols',
-            color_continuous_scale='Viridis'
-        )
-        fig10 = apply_dark_theme(fig10, 'Engagement Score vs Win Rate')
+        fig10 = q3['fig10']
         st.plotly_chart(fig10, config={'displayModeBar': False}, width='stretch')
+        st.caption(q3['fig10_caption'])
     
     # ============================================
     # STYLED FEATURE IMPORTANCE TABLE
@@ -854,6 +820,7 @@ if page == "📊 Interactive Dashboard":
         'Impact': ['High' if abs(x) > 0.3 else 'Medium' if abs(x) > 0.15 else 'Low' for x in correlations.values],
         'Direction': ['Positive' if x > 0 else 'Negative' for x in correlations.values]
     })
+    perf.record("Q3 correlations & trendlines", {'feature_importance': feature_importance})
     
     # Custom styling function with dark theme
     def style_dataframe(df):
@@ -964,106 +931,191 @@ if page == "📊 Interactive Dashboard":
     # ANOMALY DETECTION
     # ============================================
     
-    st.header("🚨 Anomalies & Outliers")
-    st.markdown("")
-    
-    # Create three columns with equal width
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("### 🏆 Top Performers")
+    @st.fragment
+    def anomaly_panels(constraints, selection, prefetched_rows, prefetched):
+        # Changing "Clans per panel" reruns only this fragment; Streamlit keeps the
+        # arguments (the filter state and the panels submitted with it) between its reruns
+        st.header("🚨 Anomalies & Outliers")
+        # Read through session_state above, so the panels are submitted with the other sections
+        anomaly_rows = st.selectbox("Clans per panel", ANOMALY_ROW_OPTIONS, index=0, key='anomaly_rows')
         st.markdown("")
         
-        # High performers
-        high_performers = df_filtered[
-            (df_filtered['win_rate'] > df_filtered['win_rate'].quantile(0.95)) &
-            (df_filtered['total_wars'] > 50)
-        ].nlargest(5, 'win_rate')
-        
-        if len(high_performers) > 0:
-            # Reset index to show as a regular column
-            high_performers_display = high_performers[['clan_name', 'win_rate', 'total_wars', 'num_members']].reset_index(drop=True)
-            
-            st.dataframe(
-                high_performers_display.style.format({
-                    'win_rate': '{:.1f}%',
-                    'total_wars': '{:.0f}',
-                    'num_members': '{:.0f}'
-                }),
-                use_container_width=True,
-                height=250
-            )
+        if anomaly_rows == prefetched_rows:
+            anomalies = prefetched.result()
         else:
-            st.info("No top performers found in filtered data")
-    
-    with col2:
-        st.markdown("### ⚡ Overperformers")
-        st.caption("High win rate despite lower member trophies")
-        st.markdown("")
+            # Fragment rerun after "Clans per panel" changed
+            anomalies = submit_anomalies(constraints, selection, anomaly_rows).result()
+        perf.record("Anomaly tables", anomalies)
         
-        # Overperformers (high win rate, low resources)
-        df_filtered['expected_wr'] = (
-            df_filtered['mean_member_trophies'] / df_filtered['mean_member_trophies'].max() * 100
-        )
-        df_filtered['wr_diff'] = df_filtered['win_rate'] - df_filtered['expected_wr']
+        # Create three columns with equal width
+        col1, col2, col3 = st.columns(3)
         
-        overperformers = df_filtered[
-            (df_filtered['wr_diff'] > 20) &
-            (df_filtered['total_wars'] > 30)
-        ].nlargest(5, 'wr_diff')
+        with col1:
+            st.markdown("### 🏆 Top Performers")
+            st.markdown("")
+            
+            # High performers
+            high_performers = anomalies['high_performers']
+            
+            if len(high_performers) > 0:
+                st.dataframe(
+                    high_performers.style.format({
+                        'win_rate': '{:.1f}%',
+                        'total_wars': '{:.0f}',
+                        'num_members': '{:.0f}'
+                    }),
+                    use_container_width=True,
+                    height=250
+                )
+            else:
+                st.info("No top performers found in filtered data")
         
-        if len(overperformers) > 0:
-            # Reset index and select columns
-            overperformers_display = overperformers[['clan_name', 'win_rate', 'mean_member_trophies', 'wr_diff']].reset_index(drop=True)
+        with col2:
+            st.markdown("### ⚡ Overperformers")
+            st.caption("High win rate despite lower member trophies")
+            st.markdown("")
             
-            st.dataframe(
-                overperformers_display.style.format({
-                    'win_rate': '{:.1f}%',
-                    'mean_member_trophies': '{:.0f}',
-                    'wr_diff': '+{:.1f}%'
-                }),
-                use_container_width=True,
-                height=250
-            )
-        else:
-            st.info("No overperformers found in filtered data")
-    
-    with col3:
-        st.markdown("### 💯 Perfect Records")
-        st.caption("Zero losses with 10+ wars")
+            # Overperformers (high win rate, low resources)
+            overperformers = anomalies['overperformers']
+            
+            if len(overperformers) > 0:
+                st.dataframe(
+                    overperformers.style.format({
+                        'win_rate': '{:.1f}%',
+                        'mean_member_trophies': '{:.0f}',
+                        'wr_diff': '+{:.1f}%'
+                    }),
+                    use_container_width=True,
+                    height=250
+                )
+            else:
+                st.info("No overperformers found in filtered data")
+        
+        with col3:
+            st.markdown("### 💯 Perfect Records")
+            st.caption("Zero losses with 10+ wars")
+            st.markdown("")
+            
+            # Perfect records
+            perfect_clans = anomalies['perfect_clans']
+            
+            if len(perfect_clans) > 0:
+                st.dataframe(
+                    perfect_clans.style.format({
+                        'war_wins': '{:.0f}',
+                        'total_wars': '{:.0f}'
+                    }),
+                    use_container_width=True,
+                    height=250
+                )
+            else:
+                st.info("No clans with perfect records found in filtered data")
+        
+        # Anomaly insight box
         st.markdown("")
+        st.markdown(f"""
+        <div class="anomaly-box">
+        <strong>🔍 Anomaly Analysis:</strong><br>
+        Identified <strong>{len(high_performers)}</strong> high-performing clans with exceptional win rates (>95th percentile) 
+        and <strong>{len(overperformers)}</strong> overperforming clans that exceed expectations based on member trophy levels. 
+        These clans may have superior strategies, coordination, or leadership worth studying.
+        </div>
+        """, unsafe_allow_html=True)
+    
+    anomaly_panels(constraints, selection, anomaly_rows, anomalies_future)
+    
+    st.markdown("---")
+    
+    # ============================================
+    # CLAN SEARCH
+    # ============================================
+    
+    SEARCH_MEASURES = {
+        'win_rate': ("Win Rate", '{:.1f}%'),
+        'num_members': ("Members", '{:.0f}'),
+        'engagement_score': ("Engagement Score", '{:.2f}'),
+        'clan_points': ("Clan Points", '{:,.0f}'),
+        'total_wars': ("Total Wars", '{:,.0f}'),
+    }
+    
+    @st.fragment
+    def clan_search(constraints, selection, n_filtered):
+        # Typing a query reruns only this fragment, against the filter state of the last full rerun
+        st.header("🔎 Clan Search")
+        query = st.text_input("Clan name or tag", placeholder="e.g. a name, part of one, or #TAG", key='clan_search')
+        if not query.strip():
+            st.caption("Matches exact tags, name prefixes, any part of a name (3+ characters) and near misspellings")
+            return
+        
+        matches = get_search_index(df.attrs['version'], df).search(query)
+        if not matches:
+            st.info(f"No clans match '{query}'")
+            return
+        
+        names, tags = df['clan_name'], df['clan_tag']
+        row, _ = st.selectbox(
+            f"{len(matches)} matches",
+            matches,
+            format_func=lambda match: f"{names.iloc[match[0]]} ({tags.iloc[match[0]]}) · {match[1]} match"
+        )
         
-        # Perfect records
-        perfect_clans = df_filtered[
-            (df_filtered['war_losses'] == 0) &
-            (df_filtered['total_wars'] > 10)
-        ].nlargest(5, 'total_wars')
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Every dashboard column of the clan, plus its derived metrics
+            clan = df.iloc[row]
+            derived = get_derived_columns(df.attrs['version'], df)
+            values = {col: clan[col] for col in df.columns}
+            values.update({name: derived.take(name, [row])[0] for name in ['expected_wr', 'wr_diff']})
+            profile = pd.DataFrame({
+                'Field': list(values),
+                'Value': [f'{v:,.2f}' if isinstance(v, (float, np.floating)) else str(v) for v in values.values()],
+            })
+            st.markdown(f"### {clan['clan_name']}")
+            st.dataframe(profile, hide_index=True, use_container_width=True, height=400)
+        
+        with col2:
+            st.markdown("### Compared with the Current Filter")
+            in_filter = selection is None or selected(selection, np.array([row]))[0]
+            st.caption(
+                f"Averages over the {n_filtered:,} filtered clans"
+                + ("" if in_filter else " (this clan is outside the current filters)")
+            )
+            averages = get_cube(df.attrs['version'], df).aggregate(constraints)
+            for measure, (label, fmt) in SEARCH_MEASURES.items():
+                value, average = float(clan[measure]), averages[measure]
+                st.metric(
+                    label,
+                    fmt.format(value),
+                    delta=None if pd.isna(average) else f"{value - average:+,.1f} vs avg {fmt.format(average)}"
+                )
         
-        if len(perfect_clans) > 0:
-            # Reset index and select columns
-            perfect_clans_display = perfect_clans[['clan_name', 'war_wins', 'total_wars', 'war_frequency']].reset_index(drop=True)
-            
+        # Nearest clans in the current filter over the standardized features (KD-tree lookup)
+        st.markdown("### 👥 Similar Clans")
+        similar_rows, distances = get_similar_clans(df.attrs['version'], df).nearest(row, bits=selection)
+        st.caption(
+            "Closest clans in the current filter by level, members, member level and trophies, "
+            "required trophies, win rate, engagement and trophy efficiency (distance in standard deviations)"
+        )
+        if len(similar_rows) > 0:
+            similar = df.iloc[similar_rows][['clan_name', 'clan_tag'] + SIMILARITY_FEATURES].reset_index(drop=True)
+            similar.insert(2, 'distance', distances)
             st.dataframe(
-                perfect_clans_display.style.format({
-                    'war_wins': '{:.0f}',
-                    'total_wars': '{:.0f}'
+                similar.style.format({
+                    'distance': '{:.2f}',
+                    'mean_member_level': '{:.1f}',
+                    'mean_member_trophies': '{:.0f}',
+                    'win_rate': '{:.1f}%',
+                    'engagement_score': '{:.2f}',
+                    'trophy_efficiency': '{:.1f}'
                 }),
-                use_container_width=True,
-                height=250
+                hide_index=True,
+                use_container_width=True
             )
         else:
-            st.info("No clans with perfect records found in filtered data")
+            st.info("No similar clans found in filtered data")
     
-    # Anomaly insight box
-    st.markdown("")
-    st.markdown(f"""
-    <div class="anomaly-box">
-    <strong>🔍 Anomaly Analysis:</strong><br>
-    Identified <strong>{len(high_performers)}</strong> high-performing clans with exceptional win rates (>95th percentile) 
-    and <strong>{len(overperformers)}</strong> overperforming clans that exceed expectations based on member trophy levels. 
-    These clans may have superior strategies, coordination, or leadership worth studying.
-    </div>
-    """, unsafe_allow_html=True)
+    clan_search(constraints, selection, n_filtered)
     
     st.markdown("---")
     
@@ -1074,6 +1126,13 @@ if page == "📊 Interactive Dashboard":
         <p>Dashboard built with Streamlit | Data processed from 3.5M+ clans</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    if perf.enabled:
+        with st.sidebar.expander("Performance", expanded=True):
+            st.caption("Wall time per section this rerun; cached sections only pay for the lookup")
+            st.dataframe(perf.summary().round(1), hide_index=True, use_container_width=True)
+            st.caption("Serialised size of each figure and table sent to the browser")
+            st.dataframe(perf.payload_table().round(1), hide_index=True, use_container_width=True)
 
 # ============================================
 # PAGE 2: KEY FINDINGS & RECOMMENDATIONS
@@ -1172,7 +1231,7 @@ else:  # Key Findings & Recommendations page
     <p><strong>Sumber Data:</strong> Clash of Clans Official API</p>
     <ul>
         <li><strong>Dataset Asli:</strong> 3,500,000+ clan dari seluruh dunia</li>
-        <li><strong>Sample Size:</strong> {len(df):,} clan (stratified sampling)</li>
+        <li><strong>Sample Size:</strong> {snapshot['metrics']['total_clans']:,} clan (stratified sampling)</li>
         <li><strong>Periode:</strong> Data snapshot Oktober 2025</li>
         <li><strong>Format:</strong> CSV dengan 27 variabel</li>
     </ul>
@@ -1208,7 +1267,7 @@ else:  # Key Findings & Recommendations page
         <li><strong>War Statistics:</strong> war_wins, war_losses, war_ties → filled with 0 (clan tidak pernah war)</li>
         <li><strong>War Frequency:</strong> war_frequency → filled with 'unknown'</li>
         <li><strong>Numeric Columns:</strong> Lainnya → filled with median untuk menghindari outlier bias</li>
-        <li><strong>Impact:</strong> Dari {df.isnull().sum().sum()} missing values menjadi 0</li>
+        <li><strong>Impact:</strong> Dari {snapshot['missing_values']} missing values menjadi 0</li>
     </ul>
     
     <p><strong>Cleaning #2: Koreksi Tipe Data & Standarisasi</strong></p>
@@ -1312,23 +1371,16 @@ else:  # Key Findings & Recommendations page
     
     st.subheader("1. Insight yang Dapat Ditindaklanjuti")
     
-    # Calculate key statistics for insights
-    family_stats = df.groupby('isFamilyFriendly').agg({
-        'win_rate': 'mean',
-        'num_members': 'mean',
-        'engagement_score': 'mean'
-    }).reset_index()
+    # Key statistics for insights (precomputed in the report snapshot)
+    ff_stats = snapshot['family']['family_friendly'] or {'win_rate': 0, 'num_members': 0}
+    nff_stats = snapshot['family']['non_family_friendly'] or {'win_rate': 0, 'num_members': 0}
     
-    war_freq_stats = df.groupby('war_frequency')['win_rate'].mean().sort_values(ascending=False)
-    best_war_freq = war_freq_stats.index[0]
-    best_war_freq_wr = war_freq_stats.values[0]
+    best_war_freq, best_war_freq_wr = snapshot['war_frequency_win_rate'][0]
     
-    correlation_vars = ['clan_level', 'num_members', 'mean_member_level', 'mean_member_trophies', 
-                       'required_trophies', 'engagement_score', 'trophy_efficiency']
-    correlations = df[correlation_vars + ['win_rate']].corr()['win_rate'].drop('win_rate').sort_values(ascending=False)
+    correlations = pd.Series(dict(snapshot['correlations']))
     
-    ff_wr = family_stats[family_stats['isFamilyFriendly']==True]['win_rate'].values[0] if len(family_stats[family_stats['isFamilyFriendly']==True]) > 0 else 0
-    nff_wr = family_stats[family_stats['isFamilyFriendly']==False]['win_rate'].values[0] if len(family_stats[family_stats['isFamilyFriendly']==False]) > 0 else 0
+    ff_wr = ff_stats['win_rate']
+    nff_wr = nff_stats['win_rate']
     
     col1, col2 = st.columns(2)
     
@@ -1337,7 +1389,7 @@ else:  # Key Findings & Recommendations page
         <div class="recommendation-box">
         <h4 style="margin-top: 0;">🎯 Insight #1: Optimal Clan Choice</h4>
         <p><strong>Finding:</strong> Family-friendly clans dengan "often" war frequency menunjukkan balance terbaik 
-        antara retention ({family_stats[family_stats['isFamilyFriendly']==True]['num_members'].values[0]:.1f} avg members) 
+        antara retention ({ff_stats['num_members']:.1f} avg members) 
         dan performance ({ff_wr:.2f}% win rate).</p>
         
         <p><strong>Action for Players:</strong></p>
@@ -1359,9 +1411,9 @@ else:  # Key Findings & Recommendations page
         
         <p><strong>Action for Clan Leaders:</strong></p>
         <ul>
-            <li>Set minimum trophy requirement: {df['mean_member_trophies'].quantile(0.75):.0f}+ (top 25%)</li>
+            <li>Set minimum trophy requirement: {snapshot['quantiles']['trophies_p75']:.0f}+ (top 25%)</li>
             <li>Prioritize clan level development</li>
-            <li>Track member engagement: min {df['engagement_score'].mean():.2f} wars/member</li>
+            <li>Track member engagement: min {snapshot['means']['engagement_score']:.2f} wars/member</li>
         </ul>
         
         <p><strong>Expected Outcome:</strong> {((correlations.values[0] + correlations.values[1]) / 2 * 100):.0f}% improvement potential in win rate.</p>
@@ -1382,7 +1434,7 @@ else:  # Key Findings & Recommendations page
             <li>Require war participation tracking</li>
         </ul>
         
-        <p><strong>Expected Outcome:</strong> {(best_war_freq_wr - df['win_rate'].mean()):.1f}% improvement from current average.</p>
+        <p><strong>Expected Outcome:</strong> {(best_war_freq_wr - snapshot['metrics']['avg_win_rate']):.1f}% improvement from current average.</p>
         </div>
         """, unsafe_allow_html=True)
         
@@ -1431,14 +1483,14 @@ else:  # Key Findings & Recommendations page
     
     <p><strong>Numeric Filter #1: Range Slider</strong></p>
     <ul>
-        <li><strong>Number of Members:</strong> Min-max slider from {int(df['num_members'].min())} to {int(df['num_members'].max())}</li>
+        <li><strong>Number of Members:</strong> Min-max slider from {snapshot['domains']['num_members'][0]} to {snapshot['domains']['num_members'][1]}</li>
         <li><strong>Implementation:</strong> <code>st.sidebar.slider()</code> with tuple return</li>
         <li><strong>Use Case:</strong> Find clans within specific size range (e.g., 25-40 members)</li>
     </ul>
     
     <p><strong>Numeric Filter #2: Range Slider</strong></p>
     <ul>
-        <li><strong>Clan Level:</strong> Min-max slider from {int(df['clan_level'].min())} to {int(df['clan_level'].max())}</li>
+        <li><strong>Clan Level:</strong> Min-max slider from {snapshot['domains']['clan_level'][0]} to {snapshot['domains']['clan_level'][1]}</li>
         <li><strong>Implementation:</strong> <code>st.sidebar.slider()</code> with tuple return</li>
         <li><strong>Use Case:</strong> Filter by clan maturity/experience level</li>
     </ul>
@@ -1455,18 +1507,8 @@ else:  # Key Findings & Recommendations page
     
     st.subheader("3. Identifikasi Anomali/Outlier")
     
-    # Calculate anomalies
-    high_performers = df[
-        (df['win_rate'] > df['win_rate'].quantile(0.95)) &
-        (df['total_wars'] > 50)
-    ]
-    
-    df_temp = df.copy()
-    df_temp['expected_wr'] = (df_temp['mean_member_trophies'] / df_temp['mean_member_trophies'].max() * 100)
-    df_temp['wr_diff'] = df_temp['win_rate'] - df_temp['expected_wr']
-    overperformers = df_temp[(df_temp['wr_diff'] > 20) & (df_temp['total_wars'] > 30)]
-    
-    perfect_clans = df[(df['war_losses'] == 0) & (df['total_wars'] > 10)]
+    # Anomaly counts (precomputed in the report snapshot)
+    anomaly_counts = snapshot['anomalies']
     
     col1, col2, col3 = st.columns(3)
     
@@ -1476,10 +1518,10 @@ else:  # Key Findings & Recommendations page
         <h4 style="color: #FFD700;">🏆 Top Performers</h4>
         <p><strong>Kriteria:</strong></p>
         <ul>
-            <li>Win rate > 95th percentile ({df['win_rate'].quantile(0.95):.2f}%)</li>
+            <li>Win rate > 95th percentile ({snapshot['quantiles']['win_rate_p95']:.2f}%)</li>
             <li>Total wars > 50 (active clans)</li>
         </ul>
-        <p><strong>Temuan:</strong> {len(high_performers)} clans</p>
+        <p><strong>Temuan:</strong> {anomaly_counts['high_performers']} clans</p>
         <p><strong>Insight:</strong> Exceptional clans dengan win rate konsisten tinggi dan track record panjang.</p>
         </div>
         """, unsafe_allow_html=True)
@@ -1494,7 +1536,7 @@ else:  # Key Findings & Recommendations page
             <li>Difference > 20%</li>
             <li>Total wars > 30</li>
         </ul>
-        <p><strong>Temuan:</strong> {len(overperformers)} clans</p>
+        <p><strong>Temuan:</strong> {anomaly_counts['overperformers']} clans</p>
         <p><strong>Insight:</strong> "David vs Goliath" - clans yang menang meski resources terbatas. Superior strategy!</p>
         </div>
         """, unsafe_allow_html=True)
@@ -1509,7 +1551,7 @@ else:  # Key Findings & Recommendations page
             <li>Total wars > 10</li>
             <li>100% win rate maintained</li>
         </ul>
-        <p><strong>Temuan:</strong> {len(perfect_clans)} clans</p>
+        <p><strong>Temuan:</strong> {anomaly_counts['perfect_clans']} clans</p>
         <p><strong>Insight:</strong> Ultra-rare perfect clans - role models untuk war strategy dan coordination.</p>
         </div>
         """, unsafe_allow_html=True)
@@ -1553,9 +1595,9 @@ else:  # Key Findings & Recommendations page
         <li><strong>Rationale:</strong> Mengukur seberapa aktif member participate dalam war (wars per member)</li>
         <li><strong>Interpretation:</strong> 
             <ul>
-                <li>Score > {df['engagement_score'].quantile(0.75):.2f}: Highly engaged clan</li>
-                <li>Score {df['engagement_score'].quantile(0.25):.2f}-{df['engagement_score'].quantile(0.75):.2f}: Average</li>
-                <li>Score < {df['engagement_score'].quantile(0.25):.2f}: Low engagement</li>
+                <li>Score > {snapshot['quantiles']['engagement_p75']:.2f}: Highly engaged clan</li>
+                <li>Score {snapshot['quantiles']['engagement_p25']:.2f}-{snapshot['quantiles']['engagement_p75']:.2f}: Average</li>
+                <li>Score < {snapshot['quantiles']['engagement_p25']:.2f}: Low engagement</li>
             </ul>
         </li>
         <li><strong>Usage:</strong> Q1 analysis (comparing engagement between family-friendly types)</li>
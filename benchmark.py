@@ -0,0 +1,330 @@
+"""Synthetic clan datasets and a headless benchmark of the dashboard hot paths.
+
+The generator writes exports with the same 27 columns as
+clash_clans_cleaned_sampled.csv at any size. The benchmark builds the
+per-dataset structures the app caches (filter engine, cube, moments,
+sketches, ranking index) and then times filtering, the Q1/Q2/Q3 sections,
+the correlations, the trendlines and the anomaly panels for a fixed set of
+filter states, without Streamlit. Results go to a JSON report; pass an
+earlier report as --baseline to flag stages that got slower.
+
+    python benchmark.py generate 100000 --out synthetic_100k.csv
+    python benchmark.py run --rows 10000 100000 1000000 3500000 --out bench.json
+    python benchmark.py run --rows 100000 --baseline bench.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly
+import pyarrow as pa
+
+from aggregates import CorrelationMoments, Cube, QuantileSketches
+from charts import trendline_traces
+from data_store import SCHEMA, USED_COLUMNS, compact_table, load_dataset, shared_frame
+from derived import DerivedColumns
+from filters import FilterEngine, filter_constraints
+from pipeline import peak_rss_mb
+from sections import compute_anomalies, compute_q1, compute_q2, compute_q3, ranking_index
+
+# ============================================
+# SYNTHETIC DATA
+# ============================================
+
+BENCHMARK_SIZES = [10_000, 100_000, 1_000_000, 3_500_000]
+
+# Rows generated per chunk, so multi-million row exports stay within memory
+GENERATE_CHUNK_ROWS = 500_000
+
+WAR_FREQUENCIES = ['always', 'morethanonceperweek', 'onceperweek', 'lessthanonceperweek', 'never', 'unknown']
+
+# Roughly how often each war frequency occurs and how many wars it leads to
+WAR_FREQUENCY_SHARE = [0.3, 0.1, 0.1, 0.1, 0.2, 0.2]
+WAR_FREQUENCY_WARS = [400, 250, 120, 40, 2, 20]
+
+LEAGUES = ['Unranked'] + [
+    f'{tier} League {rank}'
+    for tier in ['Bronze', 'Silver', 'Gold', 'Crystal', 'Master', 'Champion']
+    for rank in ['III', 'II', 'I']
+]
+
+
+def synthetic_clans(n_rows, seed=0, start=0):
+    """A synthetic cleaned export of n_rows clans (clan tags start at start)
+
+    Columns and cleaning match the real export; war activity follows the
+    war frequency and win rates rise with member trophies, so the
+    dashboard's correlations, box plots and anomaly panels are not empty.
+    """
+    rng = np.random.default_rng([seed, start])
+    n = n_rows
+
+    war_freq = rng.choice(len(WAR_FREQUENCIES), n, p=WAR_FREQUENCY_SHARE)
+    league = np.minimum(rng.geometric(0.18, n) - 1, len(LEAGUES) - 1)
+    members = rng.integers(1, 51, n)
+    clan_level = np.clip(np.round(rng.gamma(2.5, 3.5, n)), 1, 35).astype(np.int64)
+    trophies = np.clip(rng.normal(1200 + league * 230, 600), 0, 6500)
+
+    total_wars = rng.poisson(np.take(WAR_FREQUENCY_WARS, war_freq) * clan_level / 10)
+    skill = 1 / (1 + np.exp(-(trophies - 2500) / 1200 + rng.normal(0, 0.8, n)))
+    war_ties = rng.binomial(total_wars, 0.03)
+    war_wins = rng.binomial(total_wars - war_ties, skill)
+    war_losses = total_wars - war_ties - war_wins
+    win_rate = np.divide(war_wins * 100.0, total_wars, out=np.zeros(n), where=total_wars > 0)
+
+    clan_points = np.round(trophies * members * rng.uniform(0.4, 0.6, n)).astype(np.int64)
+    tags = np.arange(start, start + n)
+    return pd.DataFrame({
+        'clan_tag': [f'#{i:08X}' for i in tags],
+        'clan_name': [f'Clan {i}' for i in tags],
+        'clan_type': rng.choice(['open', 'inviteOnly', 'closed'], n, p=[0.6, 0.3, 0.1]),
+        'clan_location': rng.choice(['International', 'Indonesia', 'United States', 'India', 'Brazil'], n),
+        'isFamilyFriendly': rng.random(n) < 0.25,
+        'clan_level': clan_level,
+        'clan_points': clan_points,
+        'clan_builder_base_points': rng.integers(0, 50_000, n),
+        'clan_capital_points': rng.integers(0, 5_000, n),
+        'capital_league': rng.choice(LEAGUES, n),
+        'required_trophies': rng.integers(0, 50, n) * 100,
+        'war_frequency': np.take(WAR_FREQUENCIES, war_freq),
+        'war_win_streak': rng.integers(0, 30, n),
+        'war_wins': war_wins,
+        'war_ties': war_ties,
+        'war_losses': war_losses,
+        'clan_war_league': np.take(LEAGUES, league),
+        'num_members': members,
+        'required_builder_base_trophies': rng.integers(0, 50, n) * 100,
+        'required_townhall_level': rng.integers(1, 17, n),
+        'clan_capital_hall_level': rng.integers(0, 11, n),
+        'mean_member_level': np.clip(rng.normal(80 + trophies / 40, 30), 1, 300),
+        'mean_member_trophies': trophies,
+        'win_rate': win_rate,
+        'total_wars': total_wars,
+        'engagement_score': total_wars / members,
+        'trophy_efficiency': clan_points / members,
+    })
+
+
+def write_synthetic_csv(path, n_rows, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """Write a synthetic export to path in chunks"""
+    for start in range(0, n_rows, chunk_rows):
+        chunk = synthetic_clans(min(chunk_rows, n_rows - start), seed, start)
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def synthetic_dataset(n_rows, seed=0, chunk_rows=GENERATE_CHUNK_ROWS):
+    """The frame load_dataset would return for a synthetic export, built in memory"""
+    chunks = []
+    for start in range(0, n_rows, chunk_rows):
+        chunk = synthetic_clans(min(chunk_rows, n_rows - start), seed, start)
+        chunks.append(pa.Table.from_pandas(chunk[USED_COLUMNS], schema=SCHEMA, preserve_index=False))
+    df = shared_frame(compact_table(pa.concat_tables(chunks)))
+    df.attrs['version'] = f'synthetic-{n_rows}-{seed}'
+    return df
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+# Report layout version, bumped when records change shape
+REPORT_FORMAT = 1
+
+
+def filter_states(df):
+    """Named sidebar states the sections are timed under, from broad to narrow"""
+    full_range = {col: (int(df[col].min()), int(df[col].max())) for col in ['num_members', 'clan_level']}
+    leagues = df['clan_war_league'].value_counts()
+    return {
+        'all': filter_constraints(['All'], ['All'], 'All', full_range['num_members'], full_range['clan_level']),
+        'top_league': filter_constraints(['All'], [leagues.index[0]], 'All', full_range['num_members'], full_range['clan_level']),
+        'active_family': filter_constraints(
+            ['always', 'morethanonceperweek'], ['All'], 'Family-Friendly Only', (10, 40), full_range['clan_level']
+        ),
+        'narrow': filter_constraints(['onceperweek'], list(leagues.index[1:3]), 'Non-Family-Friendly Only', (20, 30), (5, 15)),
+    }
+
+
+def timed(func, repeat):
+    """Run func repeat times; returns its last result and the wall time of each run"""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - started)
+    return result, seconds
+
+
+def _record(dataset_rows, state, stage, rows, seconds):
+    return {
+        'dataset_rows': dataset_rows,
+        'state': state,
+        'stage': stage,
+        'rows': rows,
+        'repeat': len(seconds),
+        'min_s': min(seconds),
+        'median_s': statistics.median(seconds),
+        'max_s': max(seconds),
+    }
+
+
+def benchmark_dataset(df, repeat=3):
+    """Time every build step and section stage on df; returns report records"""
+    n = len(df)
+    records = []
+
+    def build(stage, func):
+        # One-off per dataset version in the app, so timed once
+        result, seconds = timed(func, 1)
+        records.append(_record(n, None, stage, n, seconds))
+        return result
+
+    filter_engine = build('filter_engine', lambda: FilterEngine(df))
+    cube = build('cube', lambda: Cube(df))
+    moments = build('correlation_moments', lambda: CorrelationMoments(df))
+    sketches = build('quantile_sketches', lambda: QuantileSketches(df))
+    index = build('ranking_index', lambda: ranking_index(df, DerivedColumns(df)))
+
+    for state, constraints in filter_states(df).items():
+        bits, seconds = timed(lambda: filter_engine.select_bits(constraints), repeat)
+        df_filtered = filter_engine.view(df, bits)
+        m = len(df_filtered)
+        records.append(_record(n, state, 'filter', m, seconds))
+
+        stages = {
+            'q1': lambda: compute_q1(cube, constraints),
+            'q2': lambda: compute_q2(df_filtered, cube, constraints, filter_engine, index, bits),
+            'q3': lambda: compute_q3(df_filtered, moments, constraints),
+            'correlation': lambda: moments.matrix(constraints),
+            'trendlines': lambda: trendline_traces(df_filtered, 'mean_member_trophies', 'win_rate', color='war_frequency'),
+            'anomalies': lambda: compute_anomalies(df, index, bits, sketches, constraints),
+        }
+        for stage, func in stages.items():
+            # Untimed first run, so one-off plotly and template setup is not billed to one state
+            func()
+            _, seconds = timed(func, repeat)
+            records.append(_record(n, state, stage, m, seconds))
+    return records
+
+
+def environment():
+    """Interpreter and library versions the numbers were measured with"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def run(sizes=BENCHMARK_SIZES, repeat=3, seed=0, csv_path=None):
+    """Benchmark synthetic datasets of each size (or one CSV export); returns the report"""
+    records = []
+    datasets = [('csv', lambda: load_dataset(csv_path))] if csv_path else [
+        (n_rows, lambda n_rows=n_rows: synthetic_dataset(n_rows, seed)) for n_rows in sizes
+    ]
+    for label, load in datasets:
+        df = load()
+        print(f'Benchmarking {len(df):,} rows ({label})', file=sys.stderr)
+        records.extend(benchmark_dataset(df, repeat))
+        del df
+    return {
+        'format': REPORT_FORMAT,
+        'environment': environment(),
+        'seed': seed,
+        'source': csv_path or 'synthetic',
+        'peak_rss_mb': peak_rss_mb(),
+        'results': records,
+    }
+
+
+def regressions(report, baseline, tolerance=1.25, min_seconds=0.005):
+    """Stages whose median time grew by more than tolerance versus baseline
+
+    Stages faster than min_seconds in both reports are ignored, as their
+    timings are mostly noise.
+    """
+    def key(record):
+        return record['dataset_rows'], record['state'], record['stage']
+
+    before = {key(record): record for record in baseline['results']}
+    slower = []
+    for record in report['results']:
+        old = before.get(key(record))
+        if old is None or max(old['median_s'], record['median_s']) < min_seconds:
+            continue
+        ratio = record['median_s'] / max(old['median_s'], 1e-9)
+        if ratio > tolerance:
+            slower.append(dict(record, baseline_median_s=old['median_s'], ratio=ratio))
+    return slower
+
+
+def print_table(report, file=sys.stderr):
+    """Median milliseconds per stage, one line per dataset size and filter state"""
+    rows = {}
+    for record in report['results']:
+        rows.setdefault((record['dataset_rows'], record['state'] or 'build'), {})[record['stage']] = record['median_s']
+    for (n_rows, state), stages in rows.items():
+        timings = '  '.join(f'{stage}={seconds * 1000:.1f}' for stage, seconds in stages.items())
+        print(f'{n_rows:>10,} {state:<14} {timings}', file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic clan data and dashboard benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='write a synthetic cleaned export as CSV')
+    generate.add_argument('rows', type=int)
+    generate.add_argument('--out', help='CSV path (default: synthetic_<rows>.csv)')
+    generate.add_argument('--seed', type=int, default=0)
+
+    bench = subparsers.add_parser('run', help='time the dashboard sections on synthetic data')
+    bench.add_argument('--rows', type=int, nargs='+', default=BENCHMARK_SIZES, help='dataset sizes to benchmark')
+    bench.add_argument('--csv', help='benchmark this export instead of synthetic data')
+    bench.add_argument('--repeat', type=int, default=3, help='runs per stage (default: 3)')
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--out', help='write the report as JSON to this path')
+    bench.add_argument('--baseline', help='earlier report to check for regressions')
+    bench.add_argument('--tolerance', type=float, default=1.25, help='allowed slowdown versus the baseline (default: 1.25)')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        out = args.out or f'synthetic_{args.rows}.csv'
+        write_synthetic_csv(out, args.rows, args.seed)
+        print(f'Wrote {args.rows:,} synthetic clans -> {out}')
+        return
+
+    report = run(args.rows, args.repeat, args.seed, args.csv)
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+    print_table(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for record in slower:
+            print(
+                f"regression: {record['stage']} ({record['state'] or 'build'}, {record['dataset_rows']:,} rows) "
+                f"{record['baseline_median_s'] * 1000:.1f} -> {record['median_s'] * 1000:.1f} ms",
+                file=sys.stderr
+            )
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""Figure helpers for the dashboard's Plotly charts."""
+
+import functools
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from aggregates import ols_fits
+
+# ============================================
+# THEME
+# ============================================
+
+# Registered once per process; figures reference it by name
+DARK_TEMPLATE = 'clash_dark'
+
+# Trace types the dashboard draws; the template only carries defaults for these
+TEMPLATE_TRACE_TYPES = ['bar', 'box', 'scatter', 'scattergl']
+
+# plotly_dark sections for subplot types the dashboard never uses
+UNUSED_LAYOUT_KEYS = ['geo', 'mapbox', 'polar', 'scene', 'sliderdefaults', 'ternary', 'updatemenudefaults']
+
+
+def _dark_template():
+    """plotly_dark trimmed to the trace types in use, plus the dashboard styling"""
+    base = pio.templates['plotly_dark'].to_plotly_json()
+    template = go.layout.Template(
+        data={name: traces for name, traces in base['data'].items() if name in TEMPLATE_TRACE_TYPES},
+        layout={key: value for key, value in base['layout'].items() if key not in UNUSED_LAYOUT_KEYS}
+    )
+    axis = dict(
+        title_font=dict(size=16, color="#FFFFFF"),
+        tickfont=dict(size=14, color="#FFFFFF"),
+        gridcolor='rgba(255,255,255,0.15)'
+    )
+    template.layout.update(
+        paper_bgcolor='#0E1117',
+        plot_bgcolor='#1a1f2e',
+        font=dict(family="Arial, sans-serif", color="#FFFFFF", size=14),
+        title=dict(font=dict(size=20, color="#FFFFFF", family="Arial Black")),
+        xaxis=axis,
+        yaxis=axis,
+        legend=dict(
+            font=dict(size=14, color="#FFFFFF"),
+            bgcolor='rgba(26,31,46,0.9)'
+        ),
+        margin=dict(t=70, b=70, l=70, r=40)
+    )
+    return template
+
+
+pio.templates[DARK_TEMPLATE] = _dark_template()
+
+
+def bold(title):
+    """Chart title markup used across the dashboard"""
+    return f"<b>{title}</b>"
+
+
+@functools.lru_cache(maxsize=None)
+def base_layout(title, **layout):
+    """Layout skeleton for a graph_objects figure, validated once per process
+
+    Holds only what does not depend on the data (template, title, fixed
+    sizes and axis titles). Shared between calls, so never mutate it.
+    """
+    return go.Layout(template=DARK_TEMPLATE, title_text=bold(title), **layout)
+
+
+def dark_figure(data, title, **layout):
+    """Figure from this rerun's traces on a cached layout skeleton"""
+    return go.Figure(data=data, layout=base_layout(title, **layout))
+
+
+# ============================================
+# SCATTER RENDERING
+# ============================================
+
+# Above this many points scatters are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 2000
+
+# Above this many points scatters are downsampled on the server
+MAX_SCATTER_POINTS = 15000
+
+# Grid resolution and per-cell floor used by downsample_points()
+DENSITY_BINS = 80
+MIN_POINTS_PER_CELL = 2
+
+
+def scatter_render_mode(n_points):
+    """'webgl' for large scatters, 'svg' otherwise"""
+    return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+
+def downsample_points(df, x, y, max_points=MAX_SCATTER_POINTS, bins=DENSITY_BINS, seed=0):
+    """Density-preserving sample of at most ~max_points rows of df
+
+    Points are binned on an x/y grid. Every occupied cell keeps at least
+    MIN_POINTS_PER_CELL points, so sparse regions and outliers survive, and
+    dense cells are thinned by a common ratio, so the density shape is kept.
+    Row order is preserved. Returns df unchanged when it is small enough.
+    """
+    n_rows = len(df)
+    if n_rows <= max_points:
+        return df
+
+    cell = _grid_cells(df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float), bins)
+    counts = np.bincount(cell)
+    occupied = counts[counts > 0]
+
+    # Find the thinning ratio whose per-cell quotas add up to max_points
+    def quota(ratio):
+        return np.minimum(counts, np.maximum(MIN_POINTS_PER_CELL, np.floor(counts * ratio)))
+
+    low, high = 0.0, 1.0
+    if np.minimum(occupied, MIN_POINTS_PER_CELL).sum() < max_points:
+        for _ in range(40):
+            mid = (low + high) / 2
+            if quota(mid).sum() > max_points:
+                high = mid
+            else:
+                low = mid
+    quotas = quota(low)
+
+    # Random rank of each row within its cell; keep ranks below the cell quota
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(n_rows), cell))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.empty(n_rows, dtype=np.int64)
+    rank[order] = np.arange(n_rows) - starts[cell[order]]
+    keep = np.flatnonzero(rank < quotas[cell])
+    return df.iloc[keep]
+
+
+def _grid_cells(xs, ys, bins):
+    """Flat grid cell id per point; missing coordinates get their own bucket"""
+    def bucket(values):
+        finite = np.isfinite(values)
+        if not finite.any():
+            return np.full(len(values), bins, dtype=np.int64)
+        low, high = values[finite].min(), values[finite].max()
+        scaled = (values - low) / (high - low) * bins if high > low else np.zeros(len(values))
+        scaled = np.clip(scaled, 0, bins - 1)
+        return np.where(finite, scaled, bins).astype(np.int64)
+
+    return bucket(xs) * (bins + 1) + bucket(ys)
+
+
+def point_count_caption(n_drawn, n_total):
+    """Caption telling the user how much of the selection a scatter shows"""
+    if n_drawn == n_total:
+        return f"Showing all {n_total:,} clans"
+    return f"Showing {n_drawn:,} of {n_total:,} clans (density-preserving sample; trendlines use all clans)"
+
+
+# ============================================
+# TRENDLINES
+# ============================================
+
+# Points drawn along each fitted line (enough for hover along its length)
+TRENDLINE_POINTS = 50
+
+
+def trendline_traces(df, x, y, color=None, labels=None, category_orders=None, color_discrete_sequence=None):
+    """OLS trendline traces fitted in closed form on every row of df
+
+    Replaces plotly express' trendline='ols' (one statsmodels fit per color
+    group) with ols_fits(). Traces, colors and hover text match what
+    plotly express draws, so they can be added to a scatter built from a
+    downsampled frame. Pass the scatter's labels, category_orders and
+    color_discrete_sequence so group colors line up.
+    """
+    labels = labels or {}
+    fits = ols_fits(df, x, y, by=color)
+
+    groups = list(fits.index)
+    if color is not None and category_orders and color in category_orders:
+        order = list(category_orders[color])
+        groups = sorted(groups, key=lambda g: order.index(g) if g in order else len(order))
+    palette = color_discrete_sequence or [None]
+
+    traces = []
+    for i, group in enumerate(groups):
+        fit = fits.loc[group]
+        if fit['n'] < 2 or not np.isfinite(fit['slope']):
+            continue
+
+        line_x = np.linspace(fit['x_min'], fit['x_max'], TRENDLINE_POINTS)
+        hover = (
+            "<b>OLS trendline</b><br>"
+            "%s = %g * %s + %g<br>"
+            "R<sup>2</sup>=%f<br><br>" % (y, fit['slope'], x, fit['intercept'], fit['r2'])
+        )
+        if color is not None:
+            hover += f"{labels.get(color, color)}={group}<br>"
+        hover += f"{labels.get(x, x)}=%{{x}}<br>{labels.get(y, y)}=%{{y}} <b>(trend)</b><extra></extra>"
+
+        line_color = palette[i % len(palette)]
+        traces.append(go.Scatter(
+            x=line_x,
+            y=fit['intercept'] + fit['slope'] * line_x,
+            mode='lines',
+            name='' if group is None else str(group),
+            legendgroup='' if group is None else str(group),
+            showlegend=False,
+            hovertemplate=hover,
+            marker=dict(color=line_color),
+            line=dict(color=line_color)
+        ))
+    return traces
+
+
+# ============================================
+# BOX PLOTS
+# ============================================
+
+def box_traces(groups, x, y, labels=None, color_discrete_sequence=None):
+    """Box traces drawn from precomputed statistics (see aggregates.box_stats)
+
+    groups is a list of (category, stats) in display order. Traces mirror
+    plotly express' px.box(x=x, y=y, color=x) so the chart looks the same,
+    but only the summary and a capped outlier list reach the browser.
+    """
+    labels = labels or {}
+    palette = color_discrete_sequence or [None]
+    hover = f"{labels.get(x, x)}=%{{x}}<br>{labels.get(y, y)}=%{{y}}<extra></extra>"
+
+    traces = []
+    for i, (category, stats) in enumerate(groups):
+        name = str(category)
+        traces.append(go.Box(
+            x=[category],
+            q1=[stats['q1']],
+            median=[stats['median']],
+            q3=[stats['q3']],
+            lowerfence=[stats['lowerfence']],
+            upperfence=[stats['upperfence']],
+            y=[stats['outliers']],
+            boxpoints='outliers',
+            name=name,
+            legendgroup=name,
+            offsetgroup=name,
+            alignmentgroup='True',
+            marker=dict(color=palette[i % len(palette)]),
+            notched=False,
+            orientation='v',
+            hovertemplate=hover
+        ))
+    return traces
@@ -0,0 +1,442 @@
+"""Dataset storage for the Clash of Clans dashboard.
+
+The dashboard reads the cleaned CSV export once to build a columnar Arrow
+(Feather) cache with a fixed schema. Later server processes read only the
+columns the dashboard uses from that cache and fall back to the CSV when
+the cache is stale. Either way the frame is built from read-only arrays
+(shared_frame), so one copy per process can be handed to every session.
+
+In memory and in both caches the columns are compact (compact_table):
+counts use the narrowest integer width their values fit, ratios are
+float32, low-cardinality text is categorical and names stay in Arrow
+buffers. Compare with the pandas defaults using:
+
+    python data_store.py memory [path/to/export.csv]
+
+For the full clan population there is also a column store: one
+memory-mapped NumPy file per column, so loading is instant and the OS page
+cache decides what stays in memory.
+
+Build either ahead of time with:
+
+    python data_store.py build [path/to/export.csv]
+    python data_store.py build-store path/to/full_export.csv [--out DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+# ============================================
+# SCHEMA
+# ============================================
+
+CSV_PATH = 'clash_clans_cleaned_sampled.csv'
+
+# Columns the dashboard pages actually read, with the Arrow type each is parsed as
+SCHEMA = pa.schema([
+    ('clan_tag', pa.string()),
+    ('clan_name', pa.string()),
+    ('war_frequency', pa.string()),
+    ('clan_war_league', pa.string()),
+    ('isFamilyFriendly', pa.bool_()),
+    ('clan_level', pa.int64()),
+    ('num_members', pa.int64()),
+    ('clan_points', pa.int64()),
+    ('required_trophies', pa.int64()),
+    ('war_wins', pa.int64()),
+    ('war_losses', pa.int64()),
+    ('total_wars', pa.int64()),
+    ('mean_member_level', pa.float64()),
+    ('mean_member_trophies', pa.float64()),
+    ('win_rate', pa.float64()),
+    ('engagement_score', pa.float64()),
+    ('trophy_efficiency', pa.float64()),
+])
+
+USED_COLUMNS = SCHEMA.names
+
+# Stored as integer codes plus a dictionary in the column store
+CATEGORICAL_COLUMNS = ['war_frequency', 'clan_war_league']
+
+# Stored as Arrow string buffers (UTF-8 bytes plus offsets) in the column store
+TEXT_COLUMNS = ['clan_tag', 'clan_name']
+
+# Ratios and averages, held as float32 (about 7 significant digits)
+FLOAT32_COLUMNS = ['mean_member_level', 'mean_member_trophies', 'win_rate', 'engagement_score', 'trophy_efficiency']
+
+STORE_DIR = os.environ.get('CLAN_DATA_STORE', 'clash_clans_store')
+
+# Bump when SCHEMA or compact_table changes so old Feather caches are rebuilt
+CACHE_FORMAT = 3
+
+# Bump when the column store layout or its set of columns changes
+STORE_FORMAT = 2
+
+_HASH_CHUNK = 1 << 20
+
+
+# ============================================
+# CACHE HELPERS
+# ============================================
+
+def cache_paths(csv_path=CSV_PATH):
+    """Return the (feather, metadata) paths that sit next to a CSV"""
+    base, _ = os.path.splitext(csv_path)
+    return base + '.feather', base + '.meta.json'
+
+
+def file_hash(path):
+    """SHA-256 of a file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _source_stat(csv_path):
+    stat = os.stat(csv_path)
+    return {'csv_mtime_ns': stat.st_mtime_ns, 'csv_size': stat.st_size}
+
+
+def read_csv(csv_path=CSV_PATH, columns=None):
+    """Parse the CSV with the fixed schema instead of per-process dtype inference"""
+    columns = list(columns or USED_COLUMNS)
+    dtypes = {
+        name: SCHEMA.field(name).type.to_pandas_dtype()
+        for name in columns
+        if not pa.types.is_string(SCHEMA.field(name).type)
+    }
+    return pd.read_csv(csv_path, usecols=columns, dtype=dtypes, engine='c')[columns]
+
+
+def _smallest_int_type(column):
+    """Narrowest Arrow integer type holding every value of an integer column"""
+    bounds = pc.min_max(column)
+    low, high = bounds['min'].as_py(), bounds['max'].as_py()
+    if low is None:
+        return pa.int8()
+    for arrow_type, dtype in [(pa.int8(), np.int8), (pa.int16(), np.int16), (pa.int32(), np.int32)]:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return arrow_type
+    return pa.int64()
+
+
+def compact_table(table):
+    """Cast a table parsed with SCHEMA to the compact in-memory types
+
+    Integer columns get the narrowest width their values fit and
+    FLOAT32_COLUMNS become float32. Categorical and text columns are
+    encoded later, by shared_frame or the column store.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_integer(field.type):
+            target = _smallest_int_type(table.column(i))
+        elif field.name in FLOAT32_COLUMNS:
+            target = pa.float32()
+        else:
+            continue
+        if target != field.type:
+            table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table
+
+
+def build_cache(csv_path=CSV_PATH, df=None):
+    """Convert the CSV into a Feather cache and record its source fingerprint
+
+    Pass an already-parsed frame as ``df`` to skip reading the CSV again.
+    """
+    feather_path, meta_path = cache_paths(csv_path)
+    stat = _source_stat(csv_path)
+    content_hash = file_hash(csv_path)
+
+    if df is None or list(df.columns) != USED_COLUMNS:
+        df = read_csv(csv_path)
+    table = compact_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False))
+
+    tmp_path = feather_path + '.tmp'
+    # One record batch, so numeric columns map straight onto the file when read
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, feather_path)
+
+    meta = dict(stat, csv_sha256=content_hash, format=CACHE_FORMAT, rows=table.num_rows)
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def cache_status(csv_path=CSV_PATH):
+    """Return (is_fresh, meta) for the cache belonging to csv_path
+
+    A matching mtime and size is trusted as-is. When they differ the CSV is
+    hashed, and a matching content hash revalidates the cache (e.g. after a
+    fresh checkout touched the file without changing it).
+    """
+    feather_path, meta_path = cache_paths(csv_path)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get('format') != CACHE_FORMAT or not os.path.exists(feather_path):
+        return False, meta
+
+    stat = _source_stat(csv_path)
+    if all(meta.get(key) == value for key, value in stat.items()):
+        return True, meta
+
+    if meta.get('csv_sha256') != file_hash(csv_path):
+        return False, meta
+
+    meta.update(stat)
+    try:
+        _write_meta(meta_path, meta)
+    except OSError:
+        pass
+    return True, meta
+
+
+# ============================================
+# LOADER
+# ============================================
+
+def _read_only(values):
+    values = np.asarray(values)
+    values.flags.writeable = False
+    return values
+
+
+def _encode_categories(column):
+    """Integer codes (-1 for missing, smallest dtype) and categories of a string column"""
+    encoded = pc.dictionary_encode(column)
+    categories = encoded.dictionary.to_pylist()
+    codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+    return codes.astype(_smallest_code_dtype(len(categories)), copy=False), categories
+
+
+def _text_array(column):
+    """A text column as Arrow string buffers (UTF-8 bytes plus int64 offsets)"""
+    return column.fill_null('').cast(pa.large_string())
+
+
+def shared_frame(table):
+    """Wrap an Arrow table in a DataFrame that every session can share
+
+    Numeric columns are views of the Arrow buffers where possible (of the
+    memory map, for the Feather cache), categorical columns are integer
+    codes plus categories and text stays in Arrow buffers, as in the column
+    store. Every array is read-only, so an in-place write raises instead of
+    leaking into other sessions.
+    """
+    data = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if name in CATEGORICAL_COLUMNS:
+            codes, categories = _encode_categories(column)
+            data[name] = pd.Categorical.from_codes(_read_only(codes), categories, validate=False)
+        elif name in TEXT_COLUMNS:
+            data[name] = pd.arrays.ArrowStringArray(pa.chunked_array([_text_array(column)]))
+        else:
+            data[name] = _read_only(column.to_numpy(zero_copy_only=False))
+    return pd.DataFrame(data, copy=False)
+
+
+def load_dataset(csv_path=CSV_PATH, columns=None):
+    """Load the dashboard columns, preferring the Feather cache over the CSV
+
+    The frame is read-only (see shared_frame).
+    """
+    columns = list(columns or USED_COLUMNS)
+    feather_path, _ = cache_paths(csv_path)
+
+    fresh, meta = cache_status(csv_path)
+    if fresh:
+        table = feather.read_table(feather_path, columns=columns, memory_map=True)
+    else:
+        # Stale or missing cache: serve from the CSV and rebuild for the next process
+        df = read_csv(csv_path)
+        try:
+            meta = build_cache(csv_path, df)
+        except OSError:
+            meta = None
+        schema = pa.schema([SCHEMA.field(name) for name in columns])
+        table = compact_table(pa.Table.from_pandas(df[columns], schema=schema, preserve_index=False))
+
+    df = shared_frame(table)
+    df.attrs['version'] = meta['csv_sha256'] if meta else file_hash(csv_path)
+    return df
+
+
+# ============================================
+# MEMORY-MAPPED COLUMN STORE
+# ============================================
+
+def _smallest_code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def build_column_store(csv_path, store_dir=STORE_DIR):
+    """Write every dashboard column of a CSV export as its own .npy file
+
+    Numeric and boolean columns are saved as plain arrays in their compact
+    types, categorical columns as integer codes (-1 for missing) plus a
+    dictionary in meta.json, and text columns as UTF-8 bytes plus int64
+    offsets.
+    """
+    content_hash = file_hash(csv_path)
+    table = compact_table(pa_csv.read_csv(
+        csv_path,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=USED_COLUMNS,
+            column_types=dict(zip(SCHEMA.names, SCHEMA.types))
+        )
+    ))
+
+    tmp_dir = store_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {}
+    for name in USED_COLUMNS:
+        column = table.column(name).combine_chunks()
+
+        if name in CATEGORICAL_COLUMNS:
+            codes, categories = _encode_categories(column)
+            np.save(os.path.join(tmp_dir, f'{name}.codes.npy'), codes)
+            columns[name] = {'kind': 'categorical', 'categories': categories}
+
+        elif name in TEXT_COLUMNS:
+            strings = _text_array(column)
+            _, offsets, data = strings.buffers()
+            np.save(os.path.join(tmp_dir, f'{name}.offsets.npy'), np.frombuffer(offsets, dtype=np.int64)[:len(strings) + 1])
+            np.save(os.path.join(tmp_dir, f'{name}.data.npy'), np.frombuffer(data, dtype=np.uint8) if data else np.empty(0, np.uint8))
+            columns[name] = {'kind': 'text'}
+
+        else:
+            values = column.to_numpy(zero_copy_only=False)
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), values)
+            columns[name] = {'kind': 'numeric', 'dtype': str(values.dtype)}
+
+    meta = {'format': STORE_FORMAT, 'rows': table.num_rows, 'csv_sha256': content_hash, 'columns': columns}
+    _write_meta(os.path.join(tmp_dir, 'meta.json'), meta)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return meta
+
+
+def has_column_store(store_dir=STORE_DIR):
+    """True when a built column store is available"""
+    return os.path.exists(os.path.join(store_dir, 'meta.json'))
+
+
+def open_column_store(store_dir=STORE_DIR, columns=None):
+    """Open the column store as a DataFrame backed by read-only memory maps
+
+    Nothing is read up front; pages are faulted in as columns are used.
+    """
+    meta = _read_meta(os.path.join(store_dir, 'meta.json'))
+    if meta is None or meta.get('format') != STORE_FORMAT:
+        raise ValueError(f"No usable column store in {store_dir!r}; run 'python data_store.py build-store'")
+
+    def mmap(filename):
+        return np.load(os.path.join(store_dir, filename), mmap_mode='r')
+
+    data = {}
+    for name in columns or meta['columns']:
+        info = meta['columns'][name]
+        if info['kind'] == 'categorical':
+            data[name] = pd.Categorical.from_codes(mmap(f'{name}.codes.npy'), info['categories'], validate=False)
+        elif info['kind'] == 'text':
+            offsets = mmap(f'{name}.offsets.npy')
+            strings = pa.LargeStringArray.from_buffers(
+                len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(mmap(f'{name}.data.npy'))
+            )
+            data[name] = pd.arrays.ArrowStringArray(pa.chunked_array([strings]))
+        else:
+            data[name] = mmap(f'{name}.npy')
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs['version'] = meta['csv_sha256']
+    return df
+
+
+# ============================================
+# MEMORY REPORT
+# ============================================
+
+def memory_report(csv_path=CSV_PATH):
+    """Per-column memory of the export read with pandas defaults vs the dashboard frame
+
+    Columns the dashboard does not read are reported as not loaded.
+    """
+    before = pd.read_csv(csv_path)
+    after = load_dataset(csv_path)
+    rows = []
+    for name in before.columns:
+        loaded = name in after.columns
+        rows.append({
+            'column': name,
+            'default_dtype': str(before[name].dtype),
+            'default_mb': before[name].memory_usage(index=False, deep=True) / 2**20,
+            'compact_dtype': str(after[name].dtype) if loaded else 'not loaded',
+            'compact_mb': after[name].memory_usage(index=False, deep=True) / 2**20 if loaded else 0.0,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the dashboard dataset caches')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='convert the CSV export to Feather')
+    build.add_argument('csv', nargs='?', default=CSV_PATH)
+
+    build_store = subparsers.add_parser('build-store', help='convert a full export to a memory-mapped column store')
+    build_store.add_argument('csv')
+    build_store.add_argument('--out', default=STORE_DIR)
+
+    memory = subparsers.add_parser('memory', help='compare per-column memory with the pandas defaults')
+    memory.add_argument('csv', nargs='?', default=CSV_PATH)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        meta = build_cache(args.csv)
+        print(f"Cached {meta['rows']:,} rows -> {cache_paths(args.csv)[0]}")
+    elif args.command == 'build-store':
+        meta = build_column_store(args.csv, args.out)
+        print(f"Stored {meta['rows']:,} rows -> {args.out}/")
+    elif args.command == 'memory':
+        report = memory_report(args.csv)
+        print(report.to_string(index=False, float_format='{:.2f}'.format))
+        before, after = report['default_mb'].sum(), report['compact_mb'].sum()
+        loaded = report['compact_dtype'] != 'not loaded'
+        print(f"\nTotal: {before:.1f} MB -> {after:.1f} MB ({before / after:.1f}x smaller)")
+        print(f"Dashboard columns only: {report.loc[loaded, 'default_mb'].sum():.1f} MB -> {after:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Derived metrics computed from the cleaned dataset.
+
+Each metric is registered with @derived_column and computed lazily, at
+most once per dataset version, by DerivedColumns. Values are read-only
+numpy arrays aligned with the dataset's rows, so every page and session
+can share them and filtered views index them by row id instead of
+writing new columns into a frame.
+"""
+
+import threading
+
+import numpy as np
+
+DERIVED_COLUMNS = {}
+
+
+def derived_column(name):
+    """Register a function computing a derived metric from a DerivedColumns"""
+    def register(func):
+        DERIVED_COLUMNS[name] = func
+        return func
+    return register
+
+
+# ============================================
+# METRICS
+# ============================================
+
+@derived_column('expected_wr')
+def expected_win_rate(columns):
+    """Win rate expected from member trophies, as a share of the best trophy average"""
+    trophies = columns.source('mean_member_trophies')
+    return trophies / np.nanmax(trophies) * 100
+
+
+@derived_column('wr_diff')
+def win_rate_surplus(columns):
+    """Win rate above the trophy-based expectation"""
+    return columns.source('win_rate') - columns['expected_wr']
+
+
+# ============================================
+# REGISTRY
+# ============================================
+
+class DerivedColumns:
+    """Lazily computed, read-only derived columns for one dataset version"""
+
+    def __init__(self, df):
+        self._df = df
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def source(self, col):
+        """A dataset column as a float array (no copy when it already is one)"""
+        return self._df[col].to_numpy(dtype=np.float64)
+
+    def __getitem__(self, name):
+        value = self._values.get(name)
+        if value is None:
+            with self._lock:
+                value = self._values.get(name)
+                if value is None:
+                    value = np.array(DERIVED_COLUMNS[name](self), dtype=np.float64)
+                    value.setflags(write=False)
+                    self._values[name] = value
+        return value
+
+    def take(self, name, rows=None):
+        """Values of a derived column for the given row ids (all rows when None)"""
+        values = self[name]
+        return values if rows is None else values[rows]
@@ -0,0 +1,115 @@
+"""Opt-in rerun diagnostics for the Interactive Dashboard.
+
+A PerfRecorder is created once per rerun. app.py marks where each
+section starts, or wraps sections that run on worker threads; the
+recorder keeps wall time and row counts per section and the figures and
+frames each one sends to the browser. Payload sizes
+are only measured when the panel is drawn, so they do not skew the
+timings. A disabled recorder does nothing.
+"""
+
+import time
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+from pandas.io.formats.style import Styler
+
+
+def payload_bytes(obj):
+    """Serialised size of what the browser receives for a figure or frame
+
+    Figures are sent as plotly JSON and frames as Arrow IPC; returns None
+    for anything else.
+    """
+    if isinstance(obj, go.Figure):
+        return len(pio.to_json(obj, validate=False))
+    if isinstance(obj, Styler):
+        obj = obj.data
+    if isinstance(obj, pd.DataFrame):
+        table = pa.Table.from_pandas(obj, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().size
+    return None
+
+
+class PerfRecorder:
+    """Wall time, rows and client payloads per dashboard section for one rerun"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.sections = []
+        self.payloads = []
+        self._open = None
+
+    def begin(self, section, rows=None):
+        """Start timing a section, closing the previous one"""
+        if not self.enabled:
+            return
+        self.end()
+        self._open = (section, rows, time.perf_counter())
+
+    def end(self):
+        """Close the open section, if any"""
+        if self._open is None:
+            return
+        self._add(*self._open)
+        self._open = None
+
+    def timer(self, section, rows=None):
+        """Decorator timing a callable as a section wherever it runs (e.g. a worker thread)"""
+        def wrap(func):
+            if not self.enabled:
+                return func
+
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._add(section, rows, started)
+            return timed
+        return wrap
+
+    def _add(self, section, rows, started):
+        # list.append is atomic, so worker threads can add sections concurrently
+        self.sections.append({
+            'Section': section,
+            'Time (ms)': (time.perf_counter() - started) * 1000,
+            'Rows': rows,
+        })
+
+    def record(self, section, results, skip=()):
+        """Remember the figures and frames in a results dict as sent by a section"""
+        if not self.enabled:
+            return
+        for label, value in results.items():
+            if label not in skip and isinstance(value, (go.Figure, pd.DataFrame, Styler)):
+                self.payloads.append((section, label, value))
+
+    def payload_table(self):
+        """Serialised size of every recorded figure and frame"""
+        rows = []
+        for section, label, value in self.payloads:
+            rows.append({'Section': section, 'Element': label, 'KB': payload_bytes(value) / 1024})
+        return pd.DataFrame(rows, columns=['Section', 'Element', 'KB'])
+
+    def summary(self):
+        """One row per section plus the rerun total"""
+        self.end()
+        sections = pd.DataFrame(self.sections, columns=['Section', 'Time (ms)', 'Rows'])
+        payloads = self.payload_table().groupby('Section', sort=False)['KB'].sum()
+        sections['Payload (KB)'] = sections['Section'].map(payloads).fillna(0)
+        total = {
+            'Section': 'Total',
+            'Time (ms)': (time.perf_counter() - self.started) * 1000,
+            'Rows': None,
+            'Payload (KB)': sections['Payload (KB)'].sum(),
+        }
+        summary = pd.concat([sections, pd.DataFrame([total])], ignore_index=True)
+        summary['Rows'] = summary['Rows'].astype('Int64')
+        return summary
@@ -0,0 +1,310 @@
+"""Sidebar filter engine for the Interactive Dashboard.
+
+Built once per dataset version. Category filters are answered from packed
+bitmaps (one per category value) and range sliders from a sorted index per
+column, so a filter state resolves to row ids without copying the frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+# ============================================
+# FILTER STATE
+# ============================================
+
+CATEGORY_COLUMNS = ['war_frequency', 'clan_war_league', 'isFamilyFriendly']
+RANGE_COLUMNS = ['num_members', 'clan_level']
+
+FAMILY_OPTIONS = {
+    'All': None,
+    'Family-Friendly Only': [True],
+    'Non-Family-Friendly Only': [False],
+}
+
+
+def filter_constraints(selected_war_freq, selected_leagues, family_filter, member_range, level_range):
+    """Translate sidebar widget values into engine constraints
+
+    Category constraints are lists of accepted values (None means no
+    constraint, i.e. 'All'); range constraints are inclusive (low, high).
+    """
+    return {
+        'war_frequency': None if 'All' in selected_war_freq else list(selected_war_freq),
+        'clan_war_league': None if 'All' in selected_leagues else list(selected_leagues),
+        'isFamilyFriendly': FAMILY_OPTIONS[family_filter],
+        'num_members': tuple(member_range),
+        'clan_level': tuple(level_range),
+    }
+
+
+def state_key(constraints):
+    """Hashable, order-independent key for a constraint dict
+
+    Multiselect values are sorted, so the same selection made in a
+    different order maps to the same key.
+    """
+    key = []
+    for col in CATEGORY_COLUMNS:
+        values = constraints.get(col)
+        key.append(None if values is None else tuple(sorted(set(values), key=str)))
+    for col in RANGE_COLUMNS:
+        bounds = constraints.get(col)
+        key.append(None if bounds is None else tuple(int(v) for v in bounds))
+    return tuple(key)
+
+
+def narrows(old, new):
+    """True when every constraint in new is at least as strict as in old
+
+    The rows matching new are then a subset of those matching old.
+    """
+    for col in CATEGORY_COLUMNS:
+        values, old_values = new.get(col), old.get(col)
+        if values is None:
+            if old_values is not None:
+                return False
+        elif old_values is not None and not set(values) <= set(old_values):
+            return False
+    for col in RANGE_COLUMNS:
+        bounds, old_bounds = new.get(col), old.get(col)
+        if bounds is None:
+            if old_bounds is not None:
+                return False
+        elif old_bounds is not None and (bounds[0] < old_bounds[0] or bounds[1] > old_bounds[1]):
+            return False
+    return True
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+class FilterEngine:
+    """Bitmap and sorted-index lookups over a fixed dataset"""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+
+        # Packed bitmap (1 bit per row) for every value of each category column
+        self.bitmaps = {}
+        for col in CATEGORY_COLUMNS:
+            codes, uniques = _factorize(df[col])
+            self.bitmaps[col] = {
+                value: np.packbits(codes == code)
+                for code, value in enumerate(uniques)
+            }
+
+        # Row permutation sorted by value, plus the sorted values for searchsorted
+        self.sorted_index = {}
+        for col in RANGE_COLUMNS:
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind='stable').astype(np.int32)
+            self.sorted_index[col] = (values[order], order)
+
+    def _empty(self):
+        return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+    def category_bitmap(self, col, values):
+        """OR together the bitmaps for the accepted values of a column"""
+        bits = self._empty()
+        for value in values:
+            value_bits = self.bitmaps[col].get(value)
+            if value_bits is not None:
+                bits |= value_bits
+        return bits
+
+    def range_slice(self, col, low, high):
+        """(start, stop) of the rows with low <= value <= high in the column's sorted order"""
+        sorted_values, _ = self.sorted_index[col]
+        return (
+            int(np.searchsorted(sorted_values, low, side='left')),
+            int(np.searchsorted(sorted_values, high, side='right')),
+        )
+
+    def range_bitmap(self, col, low, high):
+        """Bitmap of rows with low <= value <= high, or None if that is every row"""
+        _, order = self.sorted_index[col]
+        start, stop = self.range_slice(col, low, high)
+        if start == 0 and stop == self.n_rows:
+            return None
+
+        # Scatter whichever side of the range is smaller
+        if stop - start <= self.n_rows // 2:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[order[start:stop]] = True
+        else:
+            mask = np.ones(self.n_rows, dtype=bool)
+            mask[order[:start]] = False
+            mask[order[stop:]] = False
+        return np.packbits(mask)
+
+    def select_bits(self, constraints):
+        """Combined bitmap for a constraint dict, or None when nothing is filtered out"""
+        bits = None
+        for col in CATEGORY_COLUMNS:
+            values = constraints.get(col)
+            if values is not None:
+                col_bits = self.category_bitmap(col, values)
+                bits = col_bits if bits is None else bits & col_bits
+
+        for col in RANGE_COLUMNS:
+            bounds = constraints.get(col)
+            if bounds is not None:
+                col_bits = self.range_bitmap(col, *bounds)
+                if col_bits is not None:
+                    bits = col_bits if bits is None else bits & col_bits
+        return bits
+
+    def refine(self, previous, constraints):
+        """select_bits(constraints), narrowed from a previous (constraints, bits) pair when possible
+
+        When every constraint is at least as strict as before (see narrows),
+        the new selection is a subset of the previous one: changed category
+        filters are ANDed in and only the rows that left a slider range are
+        cleared, found through the sorted index. A widened constraint or an
+        unfiltered previous selection is evaluated in full.
+        """
+        if previous is None:
+            return self.select_bits(constraints)
+        old_constraints, old_bits = previous
+        if old_bits is None or not narrows(old_constraints, constraints):
+            return self.select_bits(constraints)
+
+        # Copied: the previous bitmap may still be read by sections of the last rerun
+        bits = old_bits.copy()
+        for col in CATEGORY_COLUMNS:
+            values, old_values = constraints.get(col), old_constraints.get(col)
+            if values is not None and (old_values is None or set(values) != set(old_values)):
+                bits &= self.category_bitmap(col, values)
+
+        for col in RANGE_COLUMNS:
+            bounds, old_bounds = constraints.get(col), old_constraints.get(col)
+            if bounds is None or (old_bounds is not None and tuple(bounds) == tuple(old_bounds)):
+                continue
+            _, order = self.sorted_index[col]
+            old_start, old_stop = (0, self.n_rows) if old_bounds is None else self.range_slice(col, *old_bounds)
+            start, stop = self.range_slice(col, *bounds)
+            _clear_bits(bits, order[old_start:start])
+            _clear_bits(bits, order[stop:old_stop])
+        return bits
+
+    def select(self, constraints):
+        """Row ids matching the constraints, or None when every row matches"""
+        bits = self.select_bits(constraints)
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+    def apply(self, df, constraints):
+        """Filtered view of df; shares data with df when nothing is filtered out"""
+        return self.view(df, self.select_bits(constraints))
+
+    def view(self, df, bits):
+        """Rows of df selected by a bitmap from select_bits()"""
+        if bits is None:
+            return df.copy(deep=False)
+        return df.iloc[np.flatnonzero(np.unpackbits(bits, count=self.n_rows))]
+
+
+def _clear_bits(bits, rows):
+    # np.packbits order: row i is bit 7 - i % 8 of byte i // 8
+    masks = np.right_shift(np.uint8(0x80), (rows & 7).astype(np.uint8))
+    np.bitwise_and.at(bits, rows >> 3, ~masks)
+
+
+def _factorize(series):
+    """Integer codes and unique values; missing values get code -1"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, list(uniques)
+
+
+# ============================================
+# TOP-K INDEX
+# ============================================
+
+# Rows examined per step of a top-k walk (doubles each step)
+TOPK_FIRST_BLOCK = 64
+
+
+class TopKIndex:
+    """Row permutations presorted by descending value, for top-k queries
+
+    A query walks one permutation and keeps the rows that are in the filter
+    selection and pass the panel's conditions, stopping once k have been
+    found, so its cost follows k rather than the row count. As with
+    nlargest(k), ties at the cut keep the earliest rows and missing values
+    are left out; tied rows are listed in row order.
+    """
+
+    def __init__(self, rankings):
+        self.orders, self.values = {}, {}
+        for name, values in rankings.items():
+            values = np.asarray(values, dtype=np.float64)
+            rows = np.flatnonzero(~np.isnan(values))
+            order = rows[np.lexsort((rows, -values[rows]))]
+            self.orders[name] = order
+            self.values[name] = values[order]
+
+    def top(self, name, k, bits=None, where=None, score=None, above=-np.inf):
+        """Up to k rows with the largest score, in order; returns (rows, scores)
+
+        bits is a FilterEngine selection bitmap (None selects every row) and
+        where(rows) an optional mask of extra conditions. Only scores above
+        ``above`` count. score(rows) rescores candidates; it must never
+        exceed the ranking value, which then serves as an upper bound to
+        stop the walk (threshold algorithm).
+        """
+        order, values = self.orders[name], self.values[name]
+        found_rows, found_scores = np.empty(0, dtype=np.int64), np.empty(0)
+        start, block = 0, TOPK_FIRST_BLOCK
+        while start < len(order) and k > 0:
+            # Unscored walks visit rows in final order: the first k hits are the answer
+            if score is None and len(found_rows) >= k:
+                break
+            # Remaining rows cannot score above the next ranking value
+            bound = values[start]
+            floor = found_scores[k - 1] if len(found_scores) >= k else above
+            if bound < floor or (bound == floor and len(found_scores) < k):
+                break
+
+            rows = order[start:start + block]
+            bounds = values[start:start + block]
+            keep = bounds > above
+            if bits is not None:
+                keep &= selected(bits, rows)
+            if where is not None:
+                keep &= where(rows)
+            rows = rows[keep]
+            scores = bounds[keep] if score is None else score(rows)
+            rows, scores = rows[scores > above], scores[scores > above]
+
+            found_rows = np.concatenate((found_rows, rows))
+            found_scores = np.concatenate((found_scores, scores))
+            ranked = np.lexsort((found_rows, -found_scores))[:k]
+            found_rows, found_scores = found_rows[ranked], found_scores[ranked]
+
+            start += block
+            block *= 2
+        return found_rows, found_scores
+
+    def count_equal(self, name, value, bits=None):
+        """Number of selected rows whose ranking value is exactly value"""
+        # Positions from the end of the descending ranking, through an ascending view
+        ascending = self.values[name][::-1]
+        stop = len(ascending) - np.searchsorted(ascending, value, side='left')
+        start = len(ascending) - np.searchsorted(ascending, value, side='right')
+        rows = self.orders[name][start:stop]
+        return len(rows) if bits is None else int(selected(bits, rows).sum())
+
+    def ascending(self, name, bits=None):
+        """Selected row ids and their values in ascending order of a ranking"""
+        order, values = self.orders[name][::-1], self.values[name][::-1]
+        if bits is None:
+            return order, values
+        keep = selected(bits, order)
+        return order[keep], values[keep]
+
+
+def selected(bits, rows):
+    """Whether each row id is set in a packed selection bitmap"""
+    return (bits[rows >> 3] >> (7 - (rows & 7))) & 1 == 1
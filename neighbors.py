@@ -0,0 +1,102 @@
+"""Similar-clan lookup: nearest neighbours over standardized clan features.
+
+SimilarClans is built once per dataset version. Each feature is scaled
+to zero mean and unit variance, so no single column dominates the
+distance, and the scaled points go into a scipy KD-tree. A query asks the
+tree for progressively more neighbours until enough of them are in the
+filter selection. When that would cost more than scanning the selection
+(a narrow filter, or a clan far from the selected ones), the selected
+clans are scanned instead: one distance each, never a distance matrix.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from filters import selected
+
+# Numeric columns that describe a clan for the similarity search
+SIMILARITY_FEATURES = [
+    'clan_level', 'num_members', 'mean_member_level', 'mean_member_trophies',
+    'required_trophies', 'win_rate', 'engagement_score', 'trophy_efficiency',
+]
+
+# Neighbours returned per query
+SIMILAR_CLANS = 10
+
+# Leaf size of the KD-tree: larger leaves build faster and use less memory
+KDTREE_LEAF_SIZE = 32
+
+# A tree query costs about as much per neighbour returned as scanning this many selected rows
+TREE_COST = 8
+
+
+class SimilarClans:
+    """k-nearest-neighbour queries over a dataset's standardized SIMILARITY_FEATURES
+
+    Rows with a missing feature are left out of the tree and never returned.
+    """
+
+    def __init__(self, df, features=SIMILARITY_FEATURES):
+        self.features = list(features)
+        self.n_rows = len(df)
+        values = np.column_stack([df[col].to_numpy(dtype=np.float64) for col in self.features])
+
+        self.mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        self.scale = np.where(std > 0, std, 1.0)
+        points = (values - self.mean) / self.scale
+
+        # Tree position -> row id for the rows with every feature present
+        self.rows = np.flatnonzero(~np.isnan(points).any(axis=1))
+        self.points = points[self.rows]
+        self.tree = cKDTree(self.points, leafsize=KDTREE_LEAF_SIZE, balanced_tree=False)
+        self._position = np.full(self.n_rows, -1, dtype=np.int64)
+        self._position[self.rows] = np.arange(len(self.rows))
+
+    def point(self, row):
+        """Standardized features of a row, or None when one is missing"""
+        position = self._position[row]
+        return None if position < 0 else self.points[position]
+
+    def nearest(self, row, k=SIMILAR_CLANS, bits=None):
+        """The k rows closest to row among the selected ones, nearest first; returns (rows, distances)
+
+        bits is a FilterEngine selection bitmap (None selects every row).
+        The row itself is never returned.
+        """
+        target = self.point(row)
+        if target is None or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        n_selected = len(self.rows) if bits is None else int(np.bitwise_count(bits).sum())
+        # Neighbours the tree should return to hold k selected ones, at the selection's density
+        count = int(np.ceil(2 * (k + 1) * len(self.rows) / max(n_selected, 1)))
+        while count * TREE_COST < n_selected:
+            distances, positions = self.tree.query(target, k=min(count, len(self.rows)))
+            distances, positions = np.atleast_1d(distances), np.atleast_1d(positions)
+            rows = self.rows[positions]
+            keep = rows != row
+            if bits is not None:
+                keep &= selected(bits, rows)
+            found = int(keep.sum())
+            if found >= k or count >= len(self.rows):
+                return rows[keep][:k], distances[keep][:k]
+            # The selection is sparser around this clan: scale by the density just seen
+            count *= max(2, int(np.ceil(2 * k / max(found, 1))))
+        return self._scan(target, row, k, bits)
+
+    def _scan(self, target, row, k, bits):
+        # One distance per selected row with every feature present
+        if bits is None:
+            positions = np.arange(len(self.rows))
+        else:
+            positions = self._position[np.flatnonzero(np.unpackbits(bits, count=self.n_rows))]
+            positions = positions[positions >= 0]
+        positions = positions[self.rows[positions] != row]
+        offsets = self.points[positions] - target
+        squared = np.einsum('ij,ij->i', offsets, offsets)
+        if len(positions) > k:
+            top = np.argpartition(squared, k - 1)[:k]
+            positions, squared = positions[top], squared[top]
+        order = np.lexsort((positions, squared))
+        return self.rows[positions[order]], np.sqrt(squared[order])
@@ -0,0 +1,247 @@
+"""Out-of-core aggregation over the raw Clash of Clans clan export.
+
+Streams the raw API dump in bounded chunks, applies the cleaning steps
+described on the report page, derives total_wars, win_rate,
+engagement_score and trophy_efficiency, and accumulates the dashboard's
+group statistics, quantiles and correlations in a single pass under a
+memory ceiling. Peak RSS is reported at the end.
+
+    python pipeline.py raw_clans.csv --memory-limit 512 --out summary.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CORRELATION_VARS, QuantileSketch, pearson_from_moments
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ============================================
+# RAW SCHEMA & CLEANING
+# ============================================
+
+RAW_COLUMNS = [
+    'isFamilyFriendly', 'war_frequency', 'clan_war_league', 'clan_level',
+    'clan_points', 'required_trophies', 'war_wins', 'war_losses', 'war_ties',
+    'num_members', 'mean_member_level', 'mean_member_trophies',
+]
+
+GROUP_DIMENSIONS = ['isFamilyFriendly', 'war_frequency', 'clan_war_league']
+GROUP_MEASURES = ['win_rate', 'num_members', 'engagement_score', 'clan_points', 'total_wars']
+
+QUANTILES = {
+    'win_rate': [0.95],
+    'engagement_score': [0.25, 0.75],
+    'mean_member_trophies': [0.75],
+}
+
+# In-memory size of a parsed chunk relative to the raw frame: derived
+# columns, the correlation matrix copy and pandas temporaries
+CHUNK_OVERHEAD = 6
+
+
+def clean_chunk(chunk):
+    """Cleaning #1 and #2 from the report page, applied to one chunk
+
+    Missing war statistics become 0 and war_frequency is lower-cased, with
+    missing values as 'unknown'. Other numeric gaps are left as NaN
+    and skipped by the accumulators, because median imputation would need a
+    second pass.
+    """
+    for col in ['war_wins', 'war_losses', 'war_ties']:
+        chunk[col] = chunk[col].fillna(0).astype(np.int64)
+    chunk['war_frequency'] = chunk['war_frequency'].fillna('unknown').astype(str).str.lower().str.strip()
+    chunk['isFamilyFriendly'] = chunk['isFamilyFriendly'].fillna(False).astype(bool)
+    return chunk
+
+
+def derive_metrics(chunk):
+    """Add the calculated metrics the dashboard is built on"""
+    chunk['total_wars'] = chunk['war_wins'] + chunk['war_losses'] + chunk['war_ties']
+    members = chunk['num_members'].where(chunk['num_members'] > 0)
+    chunk['win_rate'] = (chunk['war_wins'] / chunk['total_wars'].where(chunk['total_wars'] > 0) * 100).fillna(0)
+    chunk['engagement_score'] = (chunk['total_wars'] / members).fillna(0)
+    chunk['trophy_efficiency'] = (chunk['clan_points'] / members).fillna(0)
+    return chunk
+
+
+# ============================================
+# STREAMING ACCUMULATORS
+# ============================================
+
+class StreamingSummary:
+    """Mergeable running totals for one pass over the export"""
+
+    def __init__(self, sketch_capacity=2000):
+        self.rows = 0
+        self.totals = pd.Series(0.0, index=['num_members', 'win_rate', 'total_wars', 'isFamilyFriendly'])
+        self.present = pd.Series(0, index=self.totals.index)
+        self.groups = {dim: None for dim in GROUP_DIMENSIONS}
+        self.sketches = {col: QuantileSketch(sketch_capacity) for col in QUANTILES}
+
+        self.variables = CORRELATION_VARS + ['win_rate']
+        self.shift = None
+        self.n = 0
+        self.sums = np.zeros(len(self.variables))
+        self.cross = np.zeros((len(self.variables), len(self.variables)))
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        self.totals += chunk[self.totals.index].sum()
+        self.present += chunk[self.totals.index].count()
+
+        for dim in GROUP_DIMENSIONS:
+            grouped = chunk.groupby(dim, dropna=True)[GROUP_MEASURES]
+            part = grouped.sum().add_suffix('_sum')
+            # Non-missing values per measure, so means skip gaps like pandas' mean()
+            part = part.join(grouped.count().add_suffix('_n'))
+            part['count'] = grouped.size()
+            self.groups[dim] = part if self.groups[dim] is None else self.groups[dim].add(part, fill_value=0)
+
+        for col, sketch in self.sketches.items():
+            sketch.update(chunk[col].to_numpy(dtype=np.float64))
+
+        # Moments are shifted by the first chunk's means to stay well conditioned
+        values = chunk[self.variables].dropna().to_numpy(dtype=np.float64)
+        if self.shift is None:
+            self.shift = values.mean(axis=0) if len(values) else np.zeros(len(self.variables))
+        values -= self.shift
+        self.n += len(values)
+        self.sums += values.sum(axis=0)
+        self.cross += values.T @ values
+
+    def result(self):
+        """JSON-serialisable summary of everything seen so far"""
+        groups = {}
+        for dim, part in self.groups.items():
+            if part is None:
+                continue
+            stats = pd.DataFrame({'count': part['count'].astype(int)})
+            for measure in GROUP_MEASURES:
+                stats[measure] = part[f'{measure}_sum'] / part[f'{measure}_n']
+            groups[dim] = {str(key): row for key, row in stats.to_dict(orient='index').items()}
+
+        correlations = pearson_from_moments(self.n, self.sums, self.cross, self.variables)
+        quantiles = {
+            col: {str(q): float(v) for q, v in zip(QUANTILES[col], sketch.quantile(QUANTILES[col]))}
+            for col, sketch in self.sketches.items()
+        }
+
+        return {
+            'metrics': {
+                'total_clans': self.rows,
+                'avg_win_rate': self.totals['win_rate'] / self.present['win_rate'] if self.present['win_rate'] else None,
+                'total_members': int(self.totals['num_members']),
+                'family_friendly_pct': self.totals['isFamilyFriendly'] / self.rows * 100 if self.rows else None,
+                'avg_wars_per_clan': self.totals['total_wars'] / self.present['total_wars'] if self.present['total_wars'] else None,
+            },
+            'groups': groups,
+            'quantiles': quantiles,
+            'quantile_rank_error': {col: sketch.error_bound() for col, sketch in self.sketches.items()},
+            'correlations_with_win_rate': correlations['win_rate'].drop('win_rate').sort_values(ascending=False).to_dict(),
+        }
+
+
+# ============================================
+# MEMORY ACCOUNTING
+# ============================================
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def current_rss_mb():
+    """Current resident set size in MB, falling back to the peak"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb() or 0.0
+
+
+def plan_chunk_rows(csv_path, memory_limit_mb, sample_rows=2000):
+    """Rows per chunk that keep a parsed chunk inside the memory ceiling"""
+    sample = pd.read_csv(csv_path, nrows=sample_rows, usecols=lambda c: c in RAW_COLUMNS)
+    bytes_per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+    budget_mb = memory_limit_mb - current_rss_mb()
+    if budget_mb <= 0:
+        raise MemoryError(f'Memory limit of {memory_limit_mb} MB is below the interpreter baseline')
+    return max(1000, int(budget_mb * 2**20 / (bytes_per_row * CHUNK_OVERHEAD)))
+
+
+# ============================================
+# DRIVER
+# ============================================
+
+def run(csv_path, memory_limit_mb=512, chunk_rows=None):
+    """Aggregate a raw export in one streaming pass; returns the summary dict"""
+    started = time.perf_counter()
+    chunk_rows = chunk_rows or plan_chunk_rows(csv_path, memory_limit_mb)
+
+    summary = StreamingSummary()
+    reader = pd.read_csv(csv_path, usecols=lambda c: c in RAW_COLUMNS, chunksize=chunk_rows)
+    n_chunks = 0
+    for chunk in reader:
+        missing = set(RAW_COLUMNS) - set(chunk.columns)
+        if missing:
+            raise ValueError(f"Raw export is missing columns: {', '.join(sorted(missing))}")
+        summary.update(derive_metrics(clean_chunk(chunk)))
+        n_chunks += 1
+
+    result = summary.result()
+    result['run'] = {
+        'source': csv_path,
+        'chunk_rows': chunk_rows,
+        'chunks': n_chunks,
+        'memory_limit_mb': memory_limit_mb,
+        'peak_rss_mb': peak_rss_mb(),
+        'seconds': time.perf_counter() - started,
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream the raw clan export into dashboard aggregates')
+    parser.add_argument('csv', help='raw clan export (CSV)')
+    parser.add_argument('--memory-limit', type=float, default=512, help='memory ceiling in MB (default: 512)')
+    parser.add_argument('--chunk-rows', type=int, help='override the planned chunk size')
+    parser.add_argument('--out', help='write the summary as JSON to this path')
+    args = parser.parse_args()
+
+    result = run(args.csv, args.memory_limit, args.chunk_rows)
+    payload = json.dumps(result, indent=2, default=float)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    run_info = result['run']
+    peak = run_info['peak_rss_mb']
+    print(
+        f"{result['metrics']['total_clans']:,} clans in {run_info['chunks']} chunks of "
+        f"{run_info['chunk_rows']:,} rows, {run_info['seconds']:.1f}s, peak RSS "
+        + (f'{peak:.0f} MB' if peak is not None else 'unavailable on this platform'),
+        file=sys.stderr
+    )
+    if peak is not None and peak > args.memory_limit:
+        print(f'warning: peak RSS exceeded the {args.memory_limit:.0f} MB ceiling', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""Offline precompute of the dashboard sections for every categorical filter state.
+
+The categorical filters form a small closed space: 'All' or one value of
+war_frequency, 'All' or one clan_war_league, and the three family-friendly
+options. This job runs the Q1/Q2/Q3 and anomaly sections for each of those
+states at the default slider ranges, spread over worker processes, and
+writes every result to an artifact directory. The app looks results up
+there before computing anything (see submit_section in app.py).
+
+    python precompute.py [--workers N] [--out DIR]
+
+Results are pickled, so only load artifacts you built yourself.
+"""
+
+import argparse
+import functools
+import gzip
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from aggregates import CorrelationMoments, Cube, QuantileSketches
+from data_store import CSV_PATH, has_column_store, load_dataset, open_column_store
+from derived import DerivedColumns
+from filters import FAMILY_OPTIONS, FilterEngine, filter_constraints, state_key
+from report import load_snapshot
+from sections import ANOMALY_ROW_OPTIONS, compute_anomalies, compute_q1, compute_q2, compute_q3, ranking_index
+
+PRECOMPUTED_DIR = os.environ.get('CLAN_PRECOMPUTED', 'precomputed')
+
+# Bump when the artifact layout or the section results change shape
+PRECOMPUTE_FORMAT = 4
+
+# States decoded per process; results are re-read on cache misses only
+LOADED_STATES = 8
+
+
+def library_versions():
+    """Versions the pickled results depend on; a mismatch makes the artifact stale"""
+    return {'numpy': np.__version__, 'pandas': pd.__version__, 'plotly': plotly.__version__}
+
+
+# ============================================
+# FILTER STATES
+# ============================================
+
+def categorical_states(snapshot):
+    """Every sidebar state with 'All' or one value per categorical filter, at default slider ranges"""
+    options = snapshot['options']
+    member_range = tuple(snapshot['domains']['num_members'])
+    level_range = tuple(snapshot['domains']['clan_level'])
+    for war_freq in [['All']] + [[value] for value in options['war_frequency']]:
+        for league in [['All']] + [[value] for value in options['clan_war_league']]:
+            for family in FAMILY_OPTIONS:
+                yield filter_constraints(war_freq, league, family, member_range, level_range)
+
+
+def _key_to_json(key):
+    return [None if part is None else list(part) for part in key]
+
+
+def _key_from_json(parts):
+    return tuple(None if part is None else tuple(part) for part in parts)
+
+
+# ============================================
+# COMPUTE
+# ============================================
+
+class DashboardInputs:
+    """The per-dataset structures the app builds once and shares between sessions"""
+
+    def __init__(self, df):
+        self.df = df
+        self.filter_engine = FilterEngine(df)
+        self.cube = Cube(df)
+        self.moments = CorrelationMoments(df)
+        self.sketches = QuantileSketches(df)
+        self.index = ranking_index(df, DerivedColumns(df))
+
+    def compute_sections(self, constraints):
+        """Results of every cached section for one filter state, keyed like app.py's submit_section"""
+        bits = self.filter_engine.select_bits(constraints)
+        df_filtered = self.filter_engine.view(self.df, bits)
+        results = {
+            'q1': compute_q1(self.cube, constraints),
+            'q2': compute_q2(df_filtered, self.cube, constraints, self.filter_engine, self.index, bits),
+            'q3': compute_q3(df_filtered, self.moments, constraints),
+        }
+        for rows in ANOMALY_ROW_OPTIONS:
+            results[('anomalies', rows)] = compute_anomalies(
+                self.df, self.index, bits, self.sketches, constraints, rows
+            )
+        return results
+
+
+def load_dashboard_dataset(csv_path=CSV_PATH):
+    """The frame the app serves: the column store when built, else the cleaned export"""
+    return open_column_store() if has_column_store() else load_dataset(csv_path)
+
+
+_inputs = None
+
+
+def _init_worker(csv_path):
+    global _inputs
+    _inputs = DashboardInputs(load_dashboard_dataset(csv_path))
+
+
+def _precompute_state(job):
+    number, constraints, out_dir = job
+    filename = f'{number:04d}.pkl.gz'
+    with gzip.open(os.path.join(out_dir, filename), 'wb', compresslevel=6) as f:
+        pickle.dump(_inputs.compute_sections(constraints), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return state_key(constraints), filename
+
+
+def build(csv_path=CSV_PATH, out_dir=PRECOMPUTED_DIR, workers=None):
+    """Precompute every categorical state into out_dir; returns the manifest"""
+    started = time.perf_counter()
+    df = load_dashboard_dataset(csv_path)
+    version = df.attrs['version']
+    states = list(categorical_states(load_snapshot(df)))
+    del df
+
+    tmp_dir = out_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Each worker loads the dataset and builds the shared structures once
+    entries = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(csv_path,)) as pool:
+        futures = [pool.submit(_precompute_state, (n, c, tmp_dir)) for n, c in enumerate(states)]
+        for done, future in enumerate(as_completed(futures), 1):
+            key, filename = future.result()
+            entries.append([_key_to_json(key), filename])
+            print(f'\r{done}/{len(states)} filter states', end='', file=sys.stderr)
+    print(file=sys.stderr)
+
+    manifest = {
+        'format': PRECOMPUTE_FORMAT,
+        'version': version,
+        'libraries': library_versions(),
+        'seconds': time.perf_counter() - started,
+        'states': sorted(entries, key=lambda entry: entry[1]),
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+# ============================================
+# LOOKUP
+# ============================================
+
+@functools.lru_cache(maxsize=LOADED_STATES)
+def _load_state(path):
+    with gzip.open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class PrecomputedResults:
+    """Section results from a precompute artifact, read per filter state on demand"""
+
+    def __init__(self, out_dir, manifest):
+        self.out_dir = out_dir
+        self._files = {_key_from_json(key): filename for key, filename in manifest['states']}
+
+    def __len__(self):
+        return len(self._files)
+
+    def get(self, name, constraints):
+        """Precomputed results of a section for this filter state, or None"""
+        filename = self._files.get(state_key(constraints))
+        if filename is None:
+            return None
+        try:
+            return _load_state(os.path.join(self.out_dir, filename)).get(name)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+
+def manifest_mtime(out_dir=PRECOMPUTED_DIR):
+    """Modification time of the artifact's manifest (ns), or None when there is none
+
+    A rebuild replaces the manifest, so this changes whenever a new
+    artifact lands.
+    """
+    try:
+        return os.stat(os.path.join(out_dir, 'manifest.json')).st_mtime_ns
+    except OSError:
+        return None
+
+
+def open_precomputed(version, out_dir=PRECOMPUTED_DIR):
+    """The artifact for this dataset version, or None when missing or stale"""
+    try:
+        with open(os.path.join(out_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        manifest.get('format') != PRECOMPUTE_FORMAT
+        or manifest.get('version') != version
+        or manifest.get('libraries') != library_versions()
+    ):
+        return None
+    return PrecomputedResults(out_dir, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute dashboard sections for every categorical filter state')
+    parser.add_argument('csv', nargs='?', default=CSV_PATH, help='cleaned export, used when no column store is built')
+    parser.add_argument('--out', default=PRECOMPUTED_DIR, help=f'artifact directory (default: {PRECOMPUTED_DIR})')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    manifest = build(args.csv, args.out, args.workers)
+    size = sum(os.path.getsize(os.path.join(args.out, filename)) for _, filename in manifest['states'])
+    print(
+        f"Precomputed {len(manifest['states']):,} filter states in {manifest['seconds']:.1f}s "
+        f"-> {args.out}/ ({size / 2**20:.1f} MB)"
+    )
+
+
+if __name__ == '__main__':
+    main()
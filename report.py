@@ -0,0 +1,109 @@
+"""Report snapshot: every number that depends only on the dataset.
+
+The header metrics, slider domains, filter options and the whole Key
+Findings page are computed once per dataset version, saved next to the
+data keyed by its content hash, and rendered from the saved snapshot.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from aggregates import CORRELATION_VARS
+from derived import DerivedColumns
+
+SNAPSHOT_PATH = os.environ.get('CLAN_REPORT_SNAPSHOT', 'report_snapshot.json')
+
+# Bump when the snapshot layout changes so old files are rebuilt
+SNAPSHOT_FORMAT = 3
+
+
+def build_snapshot(df, derived=None):
+    """Compute the snapshot for a dataset (a full scan, done once per version)"""
+    derived = derived or DerivedColumns(df)
+    n_rows = len(df)
+    family = df['isFamilyFriendly'].to_numpy(dtype=bool)
+    win_rate = df['win_rate'].to_numpy(dtype=np.float64)
+    total_wars = df['total_wars'].to_numpy(dtype=np.float64)
+    trophies = df['mean_member_trophies'].to_numpy(dtype=np.float64)
+
+    def group_means(mask):
+        if not mask.any():
+            return None
+        return {
+            col: float(np.nanmean(df[col].to_numpy(dtype=np.float64)[mask]))
+            for col in ['win_rate', 'num_members', 'engagement_score']
+        }
+
+    war_freq = df.groupby('war_frequency', observed=True)['win_rate'].mean().sort_values(ascending=False)
+    correlations = df[CORRELATION_VARS + ['win_rate']].corr()['win_rate'].drop('win_rate').sort_values(ascending=False)
+
+    # Anomaly counts over the whole dataset (same rules as the dashboard panels)
+    win_rate_p95 = float(np.nanquantile(win_rate, 0.95))
+    anomalies = {
+        'high_performers': int(((win_rate > win_rate_p95) & (total_wars > 50)).sum()),
+        'overperformers': int(((derived['wr_diff'] > 20) & (total_wars > 30)).sum()),
+        'perfect_clans': int(((df['war_losses'].to_numpy() == 0) & (total_wars > 10)).sum()),
+    }
+
+    engagement = df['engagement_score'].to_numpy(dtype=np.float64)
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': df.attrs.get('version'),
+        'metrics': {
+            'total_clans': n_rows,
+            'avg_win_rate': float(np.nanmean(win_rate)),
+            'total_members': int(df['num_members'].sum()),
+            'family_friendly_pct': float(family.sum() / n_rows * 100),
+            'avg_wars_per_clan': float(np.nanmean(total_wars)),
+        },
+        'domains': {
+            col: [int(df[col].min()), int(df[col].max())]
+            for col in ['num_members', 'clan_level']
+        },
+        'options': {
+            'war_frequency': sorted(str(v) for v in df['war_frequency'].dropna().unique()),
+            'clan_war_league': sorted(str(v) for v in df['clan_war_league'].dropna().unique()),
+        },
+        'family': {
+            'family_friendly': group_means(family),
+            'non_family_friendly': group_means(~family),
+        },
+        'war_frequency_win_rate': [[str(k), float(v)] for k, v in war_freq.items()],
+        'correlations': [[k, float(v)] for k, v in correlations.items()],
+        'quantiles': {
+            'win_rate_p95': win_rate_p95,
+            'engagement_p25': float(np.nanquantile(engagement, 0.25)),
+            'engagement_p75': float(np.nanquantile(engagement, 0.75)),
+            'trophies_p75': float(np.nanquantile(trophies, 0.75)),
+        },
+        'means': {
+            'engagement_score': float(np.nanmean(engagement)),
+        },
+        'anomalies': anomalies,
+        'missing_values': int(df.isnull().sum().sum()),
+    }
+
+
+def load_snapshot(df, path=SNAPSHOT_PATH, derived=None):
+    """Return the saved snapshot for df's version, rebuilding it if needed"""
+    version = df.attrs.get('version')
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+        if version is not None and snapshot.get('version') == version and snapshot.get('format') == SNAPSHOT_FORMAT:
+            return snapshot
+    except (OSError, ValueError):
+        pass
+
+    snapshot = build_snapshot(df, derived)
+    if version is not None:
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    return snapshot
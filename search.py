@@ -0,0 +1,252 @@
+"""Clan lookup by name or tag for the dashboard's search box.
+
+ClanSearchIndex is built once per dataset version and answers a query in
+milliseconds, whatever the row count:
+
+- tags: an exact hash index (sorted 64-bit hashes of the normalised tags)
+- names, prefix: the lower-cased names in sorted order, binary searched
+- names, substring and fuzzy: an inverted index from each byte trigram of
+  the lower-cased name to the sorted row ids containing it
+
+Results are listed tag match first, then exact names, prefixes,
+substrings and finally fuzzy matches ranked by trigram similarity.
+"""
+
+import bisect
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Results returned per query
+SEARCH_LIMIT = 20
+
+# Minimum trigram similarity (shared / union of distinct trigrams) of a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+# Trigrams in more than this share of names are only checked for candidates found through rarer ones
+FUZZY_COMMON_SHARE = 0.01
+
+# Candidates checked per step when verifying substring matches
+_VERIFY_BLOCK = 256
+
+
+def normalize_tag(tag):
+    """Clan tags as stored: upper case with a leading '#'"""
+    tag = tag.strip().upper()
+    return tag if tag.startswith('#') else '#' + tag
+
+
+def _hash_strings(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+def _string_column(series):
+    """A text column as one Arrow large_string array (no copy for Arrow-backed columns)"""
+    values = pa.array(series.array)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    return values.cast(pa.large_string()).fill_null('')
+
+
+class _SortedStrings:
+    """Sequence view of a sorted Arrow string array for the bisect module"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i].as_py()
+
+
+def _trigrams(data, offsets):
+    """(trigram code, row) of every byte trigram of a string array's buffers"""
+    counts = np.maximum(np.diff(offsets) - 2, 0)
+    rows = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    # Offset of each trigram within its string, then within the data buffer
+    within = np.arange(len(rows)) - (np.cumsum(counts) - counts)[rows]
+    starts = offsets[rows] + within
+    codes = (data[starts].astype(np.int64) << 16) | (data[starts + 1].astype(np.int64) << 8) | data[starts + 2]
+    return codes, rows
+
+
+def _query_trigrams(text):
+    raw = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    if len(raw) < 3:
+        return np.empty(0, dtype=np.int64)
+    codes, _ = _trigrams(raw, np.array([0, len(raw)]))
+    return np.unique(codes)
+
+
+def _contains(postings, rows):
+    """Whether each of rows is in a sorted posting list"""
+    if len(postings) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    found = np.searchsorted(postings, rows)
+    return (found < len(postings)) & (postings[np.minimum(found, len(postings) - 1)] == rows)
+
+
+class ClanSearchIndex:
+    """Name and tag lookup over a dataset's clan_name and clan_tag columns"""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+
+        # Tags: sorted hashes with the row each came from
+        tags = pc.utf8_upper(_string_column(df['clan_tag']))
+        self.tags = tags
+        tag_hashes = _hash_strings(tags.to_numpy(zero_copy_only=False))
+        self.tag_order = np.argsort(tag_hashes, kind='stable').astype(np.int32)
+        self.tag_hashes = tag_hashes[self.tag_order]
+
+        # Names: lower-cased, in sorted order for prefix ranges
+        names = pc.utf8_lower(_string_column(df['clan_name']))
+        self.names = names
+        self.name_order = pc.sort_indices(names).to_numpy().astype(np.int32)
+        self.sorted_names = _SortedStrings(names.take(pa.array(self.name_order)))
+
+        # Trigrams: posting lists of row ids, sorted, one per distinct trigram
+        _, offsets, data = names.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64)[:len(names) + 1]
+        data = np.frombuffer(data, dtype=np.uint8) if data else np.empty(0, np.uint8)
+        codes, rows = _trigrams(data, offsets)
+        keys = np.unique((codes << 32) | rows)
+        self.trigram_codes, starts = np.unique(keys >> 32, return_index=True)
+        self.trigram_starts = np.append(starts, len(keys))
+        self.postings = (keys & 0xFFFFFFFF).astype(np.int32)
+        # Distinct trigrams per name, for the similarity of fuzzy matches
+        self.trigram_counts = np.bincount(self.postings, minlength=self.n_rows).astype(np.int32)
+
+    def nbytes(self):
+        """Memory held by the index, including its normalised copies of the names and tags"""
+        arrays = [self.tag_order, self.tag_hashes, self.name_order, self.trigram_codes,
+                  self.trigram_starts, self.postings, self.trigram_counts]
+        strings = [self.tags, self.names, self.sorted_names.values]
+        return sum(array.nbytes for array in arrays) + sum(array.nbytes for array in strings)
+
+    def _posting(self, code):
+        i = np.searchsorted(self.trigram_codes, code)
+        if i == len(self.trigram_codes) or self.trigram_codes[i] != code:
+            return np.empty(0, dtype=np.int32)
+        return self.postings[self.trigram_starts[i]:self.trigram_starts[i + 1]]
+
+    # ============================================
+    # LOOKUPS
+    # ============================================
+
+    def by_tag(self, tag):
+        """Row ids whose tag is exactly this one (after normalize_tag)"""
+        tag = normalize_tag(tag)
+        h = _hash_strings([tag])[0]
+        rows = self.tag_order[np.searchsorted(self.tag_hashes, h):np.searchsorted(self.tag_hashes, h, side='right')]
+        return np.array([row for row in rows if self.tags[int(row)].as_py() == tag], dtype=np.int64)
+
+    def by_prefix(self, prefix, limit=SEARCH_LIMIT):
+        """Up to limit row ids whose lower-cased name starts with prefix, alphabetically"""
+        prefix = prefix.lower()
+        lo = bisect.bisect_left(self.sorted_names, prefix)
+        hi = bisect.bisect_left(self.sorted_names, prefix + '\U0010ffff', lo)
+        return self.name_order[lo:min(hi, lo + limit)].astype(np.int64)
+
+    def by_substring(self, text, limit=SEARCH_LIMIT, exclude=()):
+        """Up to limit row ids whose name contains text (three bytes or more), in row order"""
+        text = text.lower()
+        codes = _query_trigrams(text)
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Intersect posting lists from the rarest trigram up
+        postings = sorted((self._posting(code) for code in codes), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = candidates[_contains(posting, candidates)]
+        candidates = candidates[~np.isin(candidates, np.asarray(exclude, dtype=np.int32))]
+
+        # Trigrams can match out of order, so confirm candidates until enough are found
+        found = []
+        for start in range(0, len(candidates), _VERIFY_BLOCK):
+            block = candidates[start:start + _VERIFY_BLOCK]
+            matches = pc.match_substring(self.names.take(pa.array(block)), text).to_numpy(zero_copy_only=False)
+            found.extend(block[matches])
+            if len(found) >= limit:
+                break
+        return np.array(found[:limit], dtype=np.int64)
+
+    def fuzzy(self, text, limit=SEARCH_LIMIT, threshold=FUZZY_THRESHOLD, exclude=()):
+        """Up to limit (row ids, similarities) of names sharing enough trigrams with text, best first
+
+        Names sharing one of the query's rarer trigrams are scored first;
+        every row is only counted when those give fewer than limit matches.
+        """
+        codes = _query_trigrams(text.lower())
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # A name reaching the threshold shares at least `needed` trigrams with the query
+        needed = max(int(np.ceil(threshold * len(codes))), 1)
+        postings = sorted((self._posting(code) for code in codes), key=len)
+        n_rare = sum(len(posting) <= self.n_rows * FUZZY_COMMON_SHARE for posting in postings)
+        rare, common = postings[:n_rare], postings[n_rare:]
+        exclude = np.asarray(exclude, dtype=np.int64)
+
+        def best(candidates, shared):
+            keep = (shared >= needed) & ~np.isin(candidates, exclude)
+            candidates, shared = candidates[keep], shared[keep]
+            similarity = shared / (len(codes) + self.trigram_counts[candidates] - shared)
+            keep = similarity >= threshold
+            candidates, similarity = candidates[keep], similarity[keep]
+            if len(candidates) > limit:
+                top = np.argpartition(-similarity, limit - 1)[:limit]
+                candidates, similarity = candidates[top], similarity[top]
+            order = np.lexsort((candidates, -similarity))
+            return candidates[order].astype(np.int64), similarity[order]
+
+        rows, similarity = np.empty(0, dtype=np.int64), np.empty(0)
+        if rare:
+            candidates, shared = np.unique(np.concatenate(rare), return_counts=True)
+            keep = shared >= needed - len(common)
+            candidates, shared = candidates[keep], shared[keep]
+            for posting in common:
+                shared += _contains(posting, candidates)
+            rows, similarity = best(candidates, shared)
+        if len(rows) < limit and needed <= len(common):
+            # Names made of common trigrams only can match too: count them for every row
+            shared = np.bincount(np.concatenate(postings), minlength=self.n_rows)
+            candidates = np.flatnonzero(shared)
+            rows, similarity = best(candidates, shared[candidates])
+        return rows, similarity
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Up to limit (row id, match) pairs for a query, best matches first
+
+        match is one of 'tag', 'name', 'prefix', 'substring' or 'fuzzy'.
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        results, seen = [], set()
+
+        def add(rows, match):
+            for row in rows:
+                row = int(row)
+                if row not in seen and len(results) < limit:
+                    seen.add(row)
+                    results.append((row, match))
+
+        add(self.by_tag(query), 'tag')
+        prefix = self.by_prefix(query, limit)
+        add(prefix[self.names.take(pa.array(prefix)).to_numpy(zero_copy_only=False) == query.lower()], 'name')
+        add(prefix, 'prefix')
+        if len(results) < limit:
+            add(self.by_substring(query, limit, exclude=list(seen)), 'substring')
+        if len(results) < limit:
+            rows, _ = self.fuzzy(query, limit, exclude=list(seen))
+            add(rows, 'fuzzy')
+        return results
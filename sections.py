@@ -0,0 +1,346 @@
+"""Per-section results for the Interactive Dashboard.
+
+Each compute_* function turns one filter state into the aggregates and
+figures a dashboard section draws, without touching Streamlit, so results
+can be cached and shared between sessions (see result_cache.py) and
+computed concurrently on worker threads.
+"""
+
+import os
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from aggregates import box_stats
+from charts import DARK_TEMPLATE, bold, box_traces, dark_figure, downsample_points, point_count_caption, scatter_render_mode, trendline_traces
+from filters import TopKIndex
+
+# Worker threads computing sections concurrently, shared by every session
+SECTION_WORKERS = int(os.environ.get('CLAN_SECTION_WORKERS', 4))
+
+# ============================================
+# Q1: FAMILY-FRIENDLY ANALYSIS
+# ============================================
+
+def compute_q1(cube, constraints):
+    """Family-friendly comparison: group means and the four bar charts"""
+    # Summed from cube cells
+    family_stats = cube.aggregate(constraints, by='isFamilyFriendly')[
+        ['isFamilyFriendly', 'win_rate', 'num_members', 'engagement_score', 'clan_points']
+    ]
+
+    family_stats['Family Type'] = family_stats['isFamilyFriendly'].map({
+        True: 'Family-Friendly',
+        False: 'Non-Family-Friendly'
+    })
+
+    # Bar chart: Win rate comparison
+    fig1 = px.bar(
+        family_stats,
+        x='Family Type',
+        y='win_rate',
+        title=bold('Average Win Rate by Clan Type'),
+        template=DARK_TEMPLATE,
+        labels={'win_rate': 'Win Rate (%)', 'Family Type': 'Clan Type'},
+        color='Family Type',
+        color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
+        text='win_rate'
+    )
+    fig1.update_traces(texttemplate='%{text:.1f}%', textposition='outside', textfont=dict(color='#FFFFFF'))
+    fig1.update_layout(showlegend=False)
+
+    # Bar chart: Member retention comparison
+    fig2 = px.bar(
+        family_stats,
+        x='Family Type',
+        y='num_members',
+        title=bold('Average Member Count by Clan Type'),
+        template=DARK_TEMPLATE,
+        labels={'num_members': 'Average Members', 'Family Type': 'Clan Type'},
+        color='Family Type',
+        color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
+        text='num_members'
+    )
+    fig2.update_traces(texttemplate='%{text:.0f}', textposition='outside', textfont=dict(color='#FFFFFF'))
+    fig2.update_layout(showlegend=False)
+
+    # Engagement comparison
+    fig3 = px.bar(
+        family_stats,
+        x='Family Type',
+        y='engagement_score',
+        title=bold('Engagement Score by Clan Type'),
+        template=DARK_TEMPLATE,
+        labels={'engagement_score': 'Wars per Member', 'Family Type': 'Clan Type'},
+        color='Family Type',
+        color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
+        text='engagement_score'
+    )
+    fig3.update_traces(texttemplate='%{text:.2f}', textposition='outside', textfont=dict(color='#FFFFFF'))
+    fig3.update_layout(showlegend=False)
+
+    fig4 = px.bar(
+        family_stats,
+        x='Family Type',
+        y='clan_points',
+        title=bold('Average Clan Points by Type'),
+        template=DARK_TEMPLATE,
+        labels={'clan_points': 'Clan Points', 'Family Type': 'Clan Type'},
+        color='Family Type',
+        color_discrete_map={'Family-Friendly': '#FFD700', 'Non-Family-Friendly': '#FF6B35'},
+        text='clan_points'
+    )
+    fig4.update_traces(texttemplate='%{text:.0f}', textposition='outside', textfont=dict(color='#FFFFFF'))
+    fig4.update_layout(showlegend=False)
+
+    return dict(family_stats=family_stats, fig1=fig1, fig2=fig2, fig3=fig3, fig4=fig4)
+
+
+# ============================================
+# Q2: WAR FREQUENCY & WIN RATE RELATIONSHIP
+# ============================================
+
+def compute_q2(df_filtered, cube, constraints, filter_engine, index, bits):
+    """War frequency and league panels"""
+    # Scatter plot: War frequency vs win rate colored by league
+    fig5_points = downsample_points(df_filtered, 'total_wars', 'win_rate')
+    fig5 = px.scatter(
+        fig5_points,
+        x='total_wars',
+        y='win_rate',
+        color='clan_war_league',
+        size='num_members',
+        hover_data=['clan_name', 'war_frequency', 'num_members'],
+        title=bold('War Activity vs Win Rate (sized by members, colored by league)'),
+        template=DARK_TEMPLATE,
+        labels={
+            'total_wars': 'Total Wars Participated',
+            'win_rate': 'Win Rate (%)',
+            'clan_war_league': 'War League'
+        },
+        opacity=0.6,
+        color_continuous_scale='Plasma',
+        render_mode=scatter_render_mode(len(fig5_points))
+    )
+    fig5.update_layout(height=500)
+
+    # Summary stats by war frequency (clan count only counts clans with a league)
+    war_freq_stats = cube.aggregate(constraints, by='war_frequency')[['war_frequency', 'win_rate', 'total_wars']]
+    league_counts = cube.aggregate(constraints, by='war_frequency', known='clan_war_league').set_index('war_frequency')['count']
+    war_freq_stats['clan_count'] = war_freq_stats['war_frequency'].map(league_counts).fillna(0)
+    war_freq_stats.columns = ['War Frequency', 'Avg Win Rate (%)', 'Avg Total Wars', 'Clan Count']
+    war_freq_stats = war_freq_stats.sort_values('Avg Win Rate (%)', ascending=False)
+
+    # Box plot: Win rate distribution by war frequency. Statistics come from
+    # the presorted win_rate order, so only the summaries reach the browser;
+    # boxes appear in order of each frequency's first clan, as in px.box
+    boxes = []
+    for frequency in filter_engine.bitmaps['war_frequency']:
+        frequency_bits = filter_engine.category_bitmap('war_frequency', [frequency])
+        rows, values = index.ascending('win_rate', frequency_bits if bits is None else frequency_bits & bits)
+        if len(rows):
+            boxes.append((rows.min(), frequency, box_stats(values)))
+    boxes.sort(key=lambda box: box[0])
+
+    fig6 = dark_figure(
+        box_traces(
+            [(frequency, stats) for _, frequency, stats in boxes],
+            'war_frequency',
+            'win_rate',
+            labels={'war_frequency': 'War Frequency', 'win_rate': 'Win Rate (%)'},
+            color_discrete_sequence=['#FFD700', '#FF6B35', '#4A90E2', '#2ECC71', '#E74C3C', '#9B59B6']
+        ),
+        'Win Rate Distribution by War Frequency',
+        xaxis_title='War Frequency',
+        yaxis_title='Win Rate (%)',
+        boxmode='overlay',
+        showlegend=False
+    )
+
+    # Bar chart: Average win rate by league
+    league_stats = cube.aggregate(constraints, by='clan_war_league')[['clan_war_league', 'win_rate']]
+    league_stats = league_stats.sort_values('win_rate', ascending=False)
+
+    fig7 = px.bar(
+        league_stats,
+        x='clan_war_league',
+        y='win_rate',
+        title=bold('Average Win Rate by War League'),
+        template=DARK_TEMPLATE,
+        labels={'clan_war_league': 'War League', 'win_rate': 'Win Rate (%)'},
+        color='win_rate',
+        color_continuous_scale='RdYlGn'
+    )
+    fig7.update_layout(xaxis_tickangle=-45)
+
+    return dict(
+        fig5=fig5,
+        fig5_caption=point_count_caption(len(fig5_points), len(df_filtered)),
+        war_freq_stats=war_freq_stats,
+        fig6=fig6,
+        fig7=fig7
+    )
+
+
+# ============================================
+# Q3: PREDICTIVE FACTORS FOR WAR SUCCESS
+# ============================================
+
+def compute_q3(df_filtered, moments, constraints):
+    """Correlations with win rate and the factor scatters"""
+    # Calculate correlations with win_rate (merged from per-cell moments)
+    correlations = moments.matrix(constraints)['win_rate'].drop('win_rate').sort_values(ascending=False)
+
+    fig8 = dark_figure(
+        go.Bar(
+            x=correlations.values,
+            y=correlations.index,
+            orientation='h',
+            marker=dict(
+                color=correlations.values,
+                colorscale='RdYlGn',
+                showscale=True,
+                colorbar=dict(
+                    title=dict(text="Correlation", font=dict(color='#FFFFFF')),
+                    tickfont=dict(color='#FFFFFF')
+                )
+            ),
+            text=correlations.values,
+            texttemplate='%{text:.3f}',
+            textposition='outside',
+            textfont=dict(color='#FFFFFF')
+        ),
+        'Correlation with Win Rate',
+        xaxis_title='<b>Correlation Coefficient</b>',
+        yaxis_title='<b>Factors</b>',
+        height=400
+    )
+
+    # Scatter: Mean member trophies vs win rate
+    # (points may be downsampled; trendlines are always fitted on every filtered clan)
+    fig9_points = downsample_points(df_filtered, 'mean_member_trophies', 'win_rate')
+    fig9_style = dict(
+        labels={
+            'mean_member_trophies': 'Average Member Trophies',
+            'win_rate': 'Win Rate (%)'
+        },
+        category_orders={'war_frequency': sorted(df_filtered['war_frequency'].unique())},
+        color_discrete_sequence=['#FFD700', '#FF6B35', '#4A90E2', '#2ECC71', '#E74C3C']
+    )
+    fig9 = px.scatter(
+        fig9_points,
+        x='mean_member_trophies',
+        y='win_rate',
+        color='war_frequency',
+        size='num_members',
+        title=bold('Member Trophy Level vs Win Rate'),
+        template=DARK_TEMPLATE,
+        opacity=0.6,
+        render_mode=scatter_render_mode(len(fig9_points)),
+        **fig9_style
+    )
+    fig9.add_traces(trendline_traces(df_filtered, 'mean_member_trophies', 'win_rate', color='war_frequency', **fig9_style))
+
+    # Scatter: Engagement score vs win rate
+    fig10_points = downsample_points(df_filtered, 'engagement_score', 'win_rate')
+    fig10_labels = {
+        'engagement_score': 'Wars per Member',
+        'win_rate': 'Win Rate (%)'
+    }
+    fig10 = px.scatter(
+        fig10_points,
+        x='engagement_score',
+        y='win_rate',
+        color='clan_level',
+        size='num_members',
+        title=bold('Engagement Score vs Win Rate'),
+        template=DARK_TEMPLATE,
+        labels=fig10_labels,
+        opacity=0.6,
+        color_continuous_scale='Viridis',
+        render_mode=scatter_render_mode(len(fig10_points))
+    )
+    fig10.add_traces(trendline_traces(df_filtered, 'engagement_score', 'win_rate', labels=fig10_labels))
+
+    return dict(
+        correlations=correlations,
+        fig8=fig8,
+        fig9=fig9,
+        fig9_caption=point_count_caption(len(fig9_points), len(df_filtered)),
+        fig10=fig10,
+        fig10_caption=point_count_caption(len(fig10_points), len(df_filtered))
+    )
+
+
+# ============================================
+# ANOMALY DETECTION
+# ============================================
+
+# Rows each anomaly panel can show
+ANOMALY_ROW_OPTIONS = [5, 10, 25]
+
+
+def ranking_index(df, derived):
+    """Presorted rankings behind fig6 and the anomaly panels, built once per dataset version"""
+    total_wars = df['total_wars'].to_numpy(dtype=np.float64)
+    return TopKIndex({
+        'win_rate': df['win_rate'].to_numpy(dtype=np.float64),
+        # Only clans without losses (NaN rows are left out), so the Perfect Records walk
+        # touches candidates instead of every high-war clan
+        'perfect_total_wars': np.where(df['war_losses'].to_numpy() == 0, total_wars, np.nan),
+        'mean_member_trophies': df['mean_member_trophies'].to_numpy(dtype=np.float64),
+        # A filter can only lower the trophy maximum, so this bounds every filtered wr_diff
+        'wr_diff': derived['wr_diff'],
+    })
+
+
+def compute_anomalies(df, index, bits, sketches, constraints, k=ANOMALY_ROW_OPTIONS[0]):
+    """Top-k tables for the three anomaly panels
+
+    Rows come from walking the presorted index over the filter selection
+    ``bits`` (see FilterEngine.select_bits) instead of masking and
+    sorting the filtered frame.
+    """
+    win_rate = df['win_rate'].to_numpy(dtype=np.float64)
+    trophies = df['mean_member_trophies'].to_numpy(dtype=np.float64)
+    total_wars = df['total_wars'].to_numpy(dtype=np.float64)
+
+    # High performers (95th percentile merged from per-partition sketches)
+    win_rate_p95 = sketches.quantile(constraints, 'win_rate', 0.95)
+    _, max_win_rate = index.top('win_rate', 1, bits)
+    if len(max_win_rate):
+        # The estimate can fall on either side of a tied maximum: settle it from the
+        # exact tie count (numpy's p95 is the maximum once the tie reaches its position)
+        n = len(df) if bits is None else int(np.bitwise_count(bits).sum())
+        tied = index.count_equal('win_rate', max_win_rate[0], bits)
+        if 0.95 * (n - 1) >= n - tied:
+            win_rate_p95 = max_win_rate[0]
+        elif win_rate_p95 >= max_win_rate[0]:
+            win_rate_p95 = np.nextafter(max_win_rate[0], -np.inf)
+    rows, _ = index.top('win_rate', k, bits, where=lambda rows: total_wars[rows] > 50, above=win_rate_p95)
+    high_performers = df.iloc[rows]
+
+    # Overperformers (high win rate, low resources); expected win rate
+    # scales trophies by the selection's highest trophy average
+    _, max_trophies = index.top('mean_member_trophies', 1, bits)
+    rows, wr_diff = np.empty(0, dtype=np.int64), np.empty(0)
+    if len(max_trophies):
+        rows, wr_diff = index.top(
+            'wr_diff', k, bits,
+            where=lambda rows: total_wars[rows] > 30,
+            score=lambda rows: win_rate[rows] - trophies[rows] / max_trophies[0] * 100,
+            above=20
+        )
+    overperformers = df.iloc[rows].assign(wr_diff=wr_diff)
+
+    # Perfect records
+    rows, _ = index.top('perfect_total_wars', k, bits, above=10)
+    perfect_clans = df.iloc[rows]
+
+    # Reset index to show as a regular column
+    return dict(
+        high_performers=high_performers[['clan_name', 'win_rate', 'total_wars', 'num_members']].reset_index(drop=True),
+        overperformers=overperformers[['clan_name', 'win_rate', 'mean_member_trophies', 'wr_diff']].reset_index(drop=True),
+        perfect_clans=perfect_clans[['clan_name', 'war_wins', 'total_wars', 'war_frequency']].reset_index(drop=True)
+    )